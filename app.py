@@ -1,9 +1,18 @@
 # app.py
+import os
+import threading
+
 import streamlit as st
-from personas import get_personas
-from data_fetch import get_live_signals
-from gpt_utils import build_portfolio_with_gpt
-from industry_select import fetch_tickers_by_industries
+import metrics
+from personas import build_persona, get_personas
+from scenario_grid import (
+    HOLDING_PERIODS, INDUSTRIES, MAX_TICKERS, RISK_OPTIONS, TICKERS_PER_INDUSTRY,
+    answers_for, get_scenario_grid, scenario_key, start_scenario_warmer,
+)
+from ttl_cache import TTLCache
+
+# data_fetch, gpt_utils and industry_select (pandas/yfinance/yahooquery/openai) are
+# imported inside step_results(), so the wizard steps render without loading them.
 
 # --------------------------
 # Page config and CSS theme
@@ -104,12 +113,7 @@ def progress_ratio():
 personas = get_personas()
 persona_keys = list(personas.keys())
 DEFAULT_TICKERS = ["AAPL", "TSLA", "GOOG", "SPY", "VOO"]
-INDUSTRIES = [
-    "Technology", "Healthcare", "Finance", "Energy", "Consumer Goods",
-    "Utilities", "Real Estate", "Industrial", "Telecommunications"
-]
-RISK_OPTIONS = ["very low", "low", "moderate", "high"]
-HOLDING_PERIODS = ["1-3 years", "4-7 years", "10+ years"]
+# INDUSTRIES, RISK_OPTIONS and HOLDING_PERIODS come from scenario_grid, which precomputes results over them
 
 # --------------------------
 # Header + progress
@@ -256,51 +260,172 @@ def step_review():
     card_end(next_label="Generate Portfolio", on_next=on_next)
 
 # --- results ---
+def render_recommendation_block(block, industries):
+    lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
+    if not lines:
+        return
+    lead = lines[0]
+    if lead.startswith("-"):
+        st.markdown(lead)
+        for cont in lines[1:]:
+            st.write(cont)
+    else:
+        st.markdown(f"- {lead}")
+        for cont in lines[1:]:
+            st.write(cont)
+
+    if industries:
+        st.caption(f"This recommendation aligns with your interest in {', '.join(industries)}.")
+
+def render_debug_panel(request_trace):
+    with st.expander(f"Timing breakdown ({request_trace.total_ms():.0f} ms total)", expanded=True):
+        st.table(request_trace.rows())
+        counters = request_trace.counter_rows()
+        if counters:
+            st.table(counters)
+
+# Finished results are memoized process-wide (shared by all sessions) on a
+# canonical key of the wizard answers, so reruns and repeat answers are instant
+# and show the same portfolio until the entry expires. Behind the memo is the
+# precomputed scenario grid (scenario_grid.py), fresh until the next market close.
+RESULTS_CACHE_TTL = int(os.getenv("RESULTS_CACHE_TTL", 15 * 60))
+
+# Run the scenario warmer inside the app process (otherwise: python3 scenario_grid.py)
+SCENARIO_WARMER = os.getenv("SCENARIO_WARMER", "0").lower() in ("1", "true", "yes")
+
+@st.cache_resource
+def get_results_memo():
+    return {
+        "entries": TTLCache(max_entries=256, ttl_seconds=RESULTS_CACHE_TTL),
+        "locks": {},
+        "guard": threading.Lock(),
+    }
+
+@st.cache_resource
+def get_scenario_warmer():
+    return start_scenario_warmer() if SCENARIO_WARMER else None
+
+@st.cache_resource
+def get_universe_refresher():
+    # Keeps the screener collections fresh in the background (UNIVERSE_REFRESH_SECONDS)
+    from industry_select import start_universe_refresher
+
+    return start_universe_refresher()
+
+def results_key(a):
+    return scenario_key(a["persona_key"], a["scenario"], a["risk"], a["holding"], a["industries"])
+
+def record_demand(key, a):
+    """Counts this session's request for these answers once, so the warmer knows what is popular."""
+    if st.session_state.get("recorded_results_key") == key:
+        return
+    st.session_state.recorded_results_key = key
+    try:
+        get_scenario_grid().record_request(key, answers_for(a["persona_key"], a["scenario"], a["risk"],
+                                                            a["holding"], a["industries"]))
+    except Exception as e:
+        print(f"[app] Could not record scenario demand: {e}")
+
+def load_precomputed(key):
+    """Blocks the warmer (or another process) computed for this key since the last close, else None."""
+    try:
+        return get_scenario_grid().get(key)
+    except Exception as e:
+        print(f"[app] Scenario grid unavailable: {e}")
+        return None
+
+def store_precomputed(key, a, blocks):
+    try:
+        get_scenario_grid().put(key, blocks, answers_for(a["persona_key"], a["scenario"], a["risk"],
+                                                          a["holding"], a["industries"]))
+    except Exception as e:
+        print(f"[app] Could not store results in the scenario grid: {e}")
+
+def compute_results(persona, industries):
+    """
+    Runs the pipeline, rendering blocks as they stream in. Returns the rendered
+    blocks and whether the response was complete (a cut-off stream is not).
+    """
+    from data_fetch import get_live_signals
+    from gpt_utils import stream_portfolio_with_gpt
+    from industry_select import fetch_tickers_by_industries
+    from optimizer import allocate_for_persona
+
+    # >>> NEW: live ticker selection by industries
+    with st.spinner("Selecting relevant companies from your chosen industries..."):
+        tickers = fetch_tickers_by_industries(industries, per_industry=TICKERS_PER_INDUSTRY, max_total=MAX_TICKERS)
+
+    with st.spinner("Fetching market signals..."):
+        signals = get_live_signals(tickers)
+
+    # Holdings and weights are computed locally; GPT explains them (or picks itself if this fails)
+    with st.spinner("Optimizing portfolio weights..."):
+        allocation = allocate_for_persona(persona, signals)
+
+    # Stream from GPT and render each bullet block as soon as it is complete
+    blocks = []
+    status = {}
+    with st.spinner("Generating recommendations..."):
+        for block in stream_portfolio_with_gpt(persona, signals, allocation=allocation, status=status):
+            render_recommendation_block(block, industries)
+            blocks.append(block)
+    return blocks, status["complete"]
+
 def step_results():
+    from gpt_utils import FALLBACK_MESSAGE
+
     a = st.session_state.answers
     persona_key = a["persona_key"]
-    persona = dict(personas[persona_key])  # copy, so we do not mutate source
-    persona["scenario"] = a["scenario"] or "balanced long-term growth"
-    persona["risk_tolerance"] = a["risk"]
-    persona["holding_period"] = a["holding"]
-    if a["industries"]:
-        persona["preferred_industries"] = a["industries"]
+    persona = build_persona(persona_key, a["scenario"], a["risk"], a["holding"], a["industries"])
 
     card_start(
         "Your tailored portfolio",
         "These recommendations are derived from your inputs and current market signals."
     )
 
-    # >>> NEW: live ticker selection by industries
-    with st.spinner("Selecting relevant companies from your chosen industries..."):
-        tickers = fetch_tickers_by_industries(a.get("industries", []), per_industry=5, max_total=15)
-
-    # Fetch signals and ask GPT
-    with st.spinner("Generating recommendations..."):
-        signals = get_live_signals(tickers)
-        report = build_portfolio_with_gpt(persona, signals)
-
-    # Render bullets with alignment note
-    chunks = [c.strip() for c in report.strip().split("\n\n") if c.strip()]
-    if not chunks:
+    get_scenario_warmer()
+    get_universe_refresher()
+    memo = get_results_memo()
+    key = results_key(a)
+    record_demand(key, a)
+
+    rendered = 0
+    with metrics.trace() as request_trace:
+        blocks = memo["entries"].get(key)
+        if blocks is None:
+            # One computation per key; concurrent sessions with the same answers wait for it
+            with memo["guard"]:
+                key_lock = memo["locks"].setdefault(key, threading.Lock())
+            try:
+                with key_lock:
+                    blocks = memo["entries"].get(key)
+                    if blocks is None:
+                        blocks = load_precomputed(key)
+                        if blocks is not None:
+                            metrics.incr("cache_hits", cache="scenario_grid")
+                            memo["entries"].put(key, blocks)
+                    if blocks is None:
+                        metrics.incr("cache_misses", cache="results")
+                        fresh, complete = compute_results(persona, a["industries"])  # rendered while streaming
+                        rendered = len(fresh)
+                        # Only whole responses are memoized; a cut-off one is shown once and recomputed next time
+                        if complete and fresh and fresh != [FALLBACK_MESSAGE]:
+                            memo["entries"].put(key, fresh)
+                            store_precomputed(key, a, fresh)
+            finally:
+                with memo["guard"]:
+                    if memo["locks"].get(key) is key_lock:
+                        del memo["locks"][key]
+        if blocks is not None:
+            metrics.incr("cache_hits", cache="results")
+            for block in blocks:
+                render_recommendation_block(block, a["industries"])
+            rendered = len(blocks)
+    if not rendered:
         st.warning("No recommendations returned. Please try again.")
-    else:
-        for block in chunks:
-            lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
-            if not lines:
-                continue
-            lead = lines[0]
-            if lead.startswith("-"):
-                st.markdown(lead)
-                for cont in lines[1:]:
-                    st.write(cont)
-            else:
-                st.markdown(f"- {lead}")
-                for cont in lines[1:]:
-                    st.write(cont)
-
-            if a["industries"]:
-                st.caption(f"This recommendation aligns with your interest in {', '.join(a['industries'])}.")
+
+    if st.session_state.get("debug_timings"):
+        render_debug_panel(request_trace)
 
     st.markdown("---")
     st.write("This is for educational purposes only and is not financial advice.")
@@ -309,6 +434,8 @@ def step_results():
 # --------------------------
 # Router
 # --------------------------
+st.sidebar.checkbox("Show timing breakdown", key="debug_timings")
+
 current = STEPS[st.session_state.step_idx]
 if current == "persona":
     step_persona()
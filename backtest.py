@@ -0,0 +1,274 @@
+"""
+backtest.py
+
+Checks how generated portfolios actually performed. Portfolios come from the
+report store (the tickers of each saved report, equally weighted, held from the
+day the report was written) or from a JSON file of weight definitions:
+    [{"name": "core", "persona": "college_student", "start": "2024-01-02",
+      "end": "2024-06-28", "weights": {"AAPL": 0.5, "VOO": 0.5}}, ...]
+
+Prices are read from a date x ticker matrix exported from the local price store
+to a .npy file (forward-filled, 0 before a ticker's first price) and
+memory-mapped, so thousands of portfolios share one copy.
+All portfolios are evaluated together in one NumPy pass: buy-and-hold values
+are a single (portfolios x tickers) @ (tickers x days) product, and every
+metric is computed on the resulting (portfolios x days) matrix.
+
+Per portfolio: cumulative return, annualized volatility, max drawdown, and
+return in excess of each benchmark (SPY and VOO) over the same window.
+
+Key functions:
+- build_price_matrix(tickers, start): Exports stored prices to the memory-mapped matrix.
+- load_price_matrix(): Opens the matrix (read-only memory map).
+- portfolios_from_reports(): Portfolio definitions from the report store index.
+- run_backtest(matrix, portfolios, benchmarks): Metrics for every portfolio.
+- summarize_by_persona() / export_results(): Per-persona comparison and CSV/JSON export.
+
+Usage: python3 backtest.py [--persona college_student] [--portfolios defs.json]
+                           [--sync] [--output backtests]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import warnings
+from datetime import date
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from data_fetch import ffill_matrix
+from price_store import get_price_store
+from report_store import get_report_store
+
+DEFAULT_MATRIX_PATH = os.getenv("PRICE_MATRIX_PATH", os.path.join(".cache", "price_matrix.npy"))
+BENCHMARKS = ["SPY", "VOO"]
+TRADING_DAYS_PER_YEAR = 252
+
+
+class PriceMatrix:
+    """Adjusted closes as a (days x tickers) array (0 = no price yet), with date and ticker indexes."""
+
+    def __init__(self, dates: np.ndarray, tickers: List[str], prices: np.ndarray):
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.tickers = list(tickers)
+        self.prices = prices
+        self.columns = {t: i for i, t in enumerate(self.tickers)}
+
+    def day_index(self, day, side: str = "left") -> int:
+        """Row of the first trading day on/after `day` (side="left") or the last on/before it ("right")."""
+        pos = int(np.searchsorted(self.dates, np.datetime64(day, "D"), side=side))
+        return pos if side == "left" else pos - 1
+
+
+def _meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def build_price_matrix(tickers: List[str], start: str, path: str = DEFAULT_MATRIX_PATH,
+                       sync: bool = False) -> PriceMatrix:
+    """
+    Writes stored prices of `tickers` since `start` (ISO date) to `path` (.npy,
+    plus a .json sidecar with dates and tickers) and returns it memory-mapped.
+    With sync=True the price store is brought up to date from Yahoo first.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    days = (date.today() - date.fromisoformat(start)).days + 7
+    if sync:
+        from data_fetch import PERIOD_DAYS, sync_price_store
+
+        period = next((p for p, d in sorted(PERIOD_DAYS.items(), key=lambda kv: kv[1]) if d >= days), "5y")
+        sync_price_store(tickers, period)
+
+    with metrics.span("backtest.build_price_matrix", symbols=len(tickers)):
+        frame = get_price_store().load_window(tickers, days)
+        if frame.empty:  # nothing stored yet: an empty (0 x tickers) matrix
+            frame = pd.DataFrame(index=pd.DatetimeIndex([]), dtype=float)
+        frame = frame.reindex(columns=tickers)
+        frame = frame[frame.index >= pd.Timestamp(start)]
+        prices = np.nan_to_num(ffill_matrix(frame.to_numpy(dtype=float)), nan=0.0)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory or ".", suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, prices)
+        os.replace(tmp_path, path)
+        meta = {"dates": [d.strftime("%Y-%m-%d") for d in frame.index], "tickers": tickers}
+        with open(_meta_path(path) + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(_meta_path(path) + ".tmp", _meta_path(path))
+    return load_price_matrix(path)
+
+
+def load_price_matrix(path: str = DEFAULT_MATRIX_PATH) -> PriceMatrix:
+    with open(_meta_path(path), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return PriceMatrix(np.array(meta["dates"], dtype="datetime64[D]"), meta["tickers"],
+                       np.load(path, mmap_mode="r"))
+
+
+def portfolios_from_reports(persona: str = None, since: float = None, limit: int = 100_000,
+                            root: str = None) -> List[dict]:
+    """Equal-weight portfolio of each indexed report's tickers, starting on the report date."""
+    store = get_report_store(root) if root else get_report_store()
+    portfolios = []
+    for record in store.list(persona=persona, since=since, limit=limit):
+        if not record["tickers"]:
+            continue
+        weight = 1.0 / len(record["tickers"])
+        portfolios.append({
+            "name": f"report-{record['id']}",
+            "persona": record["persona"],
+            "start": time.strftime("%Y-%m-%d", time.localtime(record["created_at"])),
+            "weights": {t: weight for t in record["tickers"]},
+        })
+    return portfolios
+
+
+def run_backtest(matrix: PriceMatrix, portfolios: List[dict], benchmarks: List[str] = BENCHMARKS) -> pd.DataFrame:
+    """
+    Buy-and-hold metrics for every portfolio, computed together. Tickers without
+    a price on the start day are dropped and the remaining weights renormalized.
+    Returns one row per portfolio (portfolios with no priced holdings are skipped).
+    """
+    if not portfolios or not len(matrix.dates):
+        return pd.DataFrame()
+
+    with metrics.span("backtest.run", portfolios=len(portfolios)):
+        prices = matrix.prices                               # days x tickers (memory-mapped)
+        n_days, n_tickers = prices.shape
+
+        weights = np.zeros((len(portfolios), n_tickers))
+        for p, portfolio in enumerate(portfolios):
+            for ticker, w in portfolio["weights"].items():
+                j = matrix.columns.get(ticker)
+                if j is not None:
+                    weights[p, j] += w
+        start = np.array([matrix.day_index(p["start"]) for p in portfolios])
+        end = np.array([
+            matrix.day_index(p["end"], side="right") if p.get("end") else n_days - 1 for p in portfolios
+        ])
+        valid = start < end
+
+        # Value of 1 unit split by weight on the start day: (w / price_at_start) @ prices.T
+        start_prices = prices[np.minimum(start, n_days - 1)]   # portfolios x tickers
+        weights = np.where(start_prices > 0, weights, 0.0)
+        total = weights.sum(axis=1)
+        valid &= total > 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            units = np.where(weights > 0, weights / total[:, None] / start_prices, 0.0)
+        values = units @ prices.T                             # portfolios x days
+
+        days = np.arange(n_days)
+        in_window = (days >= start[:, None]) & (days <= end[:, None]) & valid[:, None]
+        values = np.where(in_window, values, np.nan)
+        rows = np.arange(len(portfolios))
+        end_clipped = np.minimum(end, n_days - 1)
+
+        with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            cumulative = values[rows, end_clipped] - 1.0
+            daily = values[:, 1:] / values[:, :-1] - 1.0
+            volatility = np.nanstd(np.where(np.isfinite(daily), daily, np.nan), axis=1, ddof=1) \
+                * np.sqrt(TRADING_DAYS_PER_YEAR)
+            peak = np.fmax.accumulate(np.where(in_window, values, -np.inf), axis=1)
+            max_drawdown = np.nanmin(np.where(in_window, values / peak - 1.0, np.nan), axis=1)
+
+            result = {
+                "name": [p.get("name", str(i)) for i, p in enumerate(portfolios)],
+                "persona": [p.get("persona") for p in portfolios],
+                "start": matrix.dates[np.minimum(start, n_days - 1)].astype(str),
+                "end": matrix.dates[end_clipped].astype(str),
+                "holdings": (weights > 0).sum(axis=1),
+                "cumulative_return": cumulative,
+                "volatility": volatility,
+                "max_drawdown": max_drawdown,
+            }
+            for bench in benchmarks:
+                j = matrix.columns.get(bench)
+                if j is None:
+                    continue
+                series = prices[:, j]
+                base = series[np.minimum(start, n_days - 1)]
+                bench_return = np.where(base > 0, series[end_clipped] / base - 1.0, np.nan)
+                result[f"{bench.lower()}_return"] = bench_return
+                result[f"excess_vs_{bench.lower()}"] = cumulative - bench_return
+
+    frame = pd.DataFrame(result)
+    return frame[valid].reset_index(drop=True)
+
+
+def summarize_by_persona(results: pd.DataFrame) -> pd.DataFrame:
+    """Portfolio count plus mean and median of every metric, per persona."""
+    if results.empty:
+        return pd.DataFrame()
+    numeric = results.drop(columns=["name", "start", "end"]).fillna({"persona": "(none)"})
+    grouped = numeric.groupby("persona")
+    summary = grouped.agg(["mean", "median"])
+    summary.columns = [f"{metric}_{stat}" for metric, stat in summary.columns]
+    summary.insert(0, "portfolios", grouped.size())
+    return summary
+
+
+def export_results(results: pd.DataFrame, output_dir: str = "backtests") -> Dict[str, str]:
+    """Writes one CSV per persona plus summary.csv/summary.json. Returns {name: path}."""
+    os.makedirs(output_dir, exist_ok=True)
+    written = {}
+    for persona, rows in results.fillna({"persona": "(none)"}).groupby("persona"):
+        path = os.path.join(output_dir, f"{persona.lower().replace(' ', '_')}_backtest.csv")
+        rows.to_csv(path, index=False)
+        written[persona] = path
+    summary = summarize_by_persona(results)
+    summary.to_csv(os.path.join(output_dir, "summary.csv"))
+    summary.to_json(os.path.join(output_dir, "summary.json"), orient="index", indent=2)
+    written["summary"] = os.path.join(output_dir, "summary.csv")
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest saved report portfolios against SPY/VOO.")
+    parser.add_argument("--persona", default=None, help="only reports for this persona")
+    parser.add_argument("--portfolios", default=None, help="JSON file of weight definitions (instead of reports)")
+    parser.add_argument("--reports-dir", default=None, help="report store root (default reports/)")
+    parser.add_argument("--matrix", default=DEFAULT_MATRIX_PATH, help="memory-mapped price matrix path")
+    parser.add_argument("--sync", action="store_true", help="update the price store from Yahoo first")
+    parser.add_argument("--output", default="backtests")
+    args = parser.parse_args(argv)
+
+    if args.portfolios:
+        with open(args.portfolios, "r", encoding="utf-8") as f:
+            portfolios = json.load(f)
+        if args.persona:
+            portfolios = [p for p in portfolios if p.get("persona") == args.persona]
+    else:
+        portfolios = portfolios_from_reports(persona=args.persona, root=args.reports_dir)
+    if not portfolios:
+        print("No portfolios to backtest.")
+        return
+
+    tickers = sorted({t for p in portfolios for t in p["weights"]} | set(BENCHMARKS))
+    start = min(p["start"] for p in portfolios)
+    matrix = build_price_matrix(tickers, start, path=args.matrix, sync=args.sync)
+
+    started = time.perf_counter()
+    results = run_backtest(matrix, portfolios)
+    print(f"Backtested {len(results)}/{len(portfolios)} portfolios in {time.perf_counter() - started:.3f}s")
+    if results.empty:
+        return
+
+    summary = summarize_by_persona(results)
+    columns = ["portfolios", "cumulative_return_mean", "volatility_mean", "max_drawdown_mean", "excess_vs_spy_mean"]
+    print("\n===== Per-persona summary =====\n")
+    print(summary[[c for c in columns if c in summary]].to_string())
+    for name, path in export_results(results, args.output).items():
+        print(f"{name}: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+benchmark.py
+
+End-to-end benchmark of the recommendation pipeline. Times each stage on fixed
+ticker sets (5, 15, 100 and 500 symbols) against local stand-ins for Yahoo and
+OpenAI, so the numbers measure our own overhead rather than upstream latency:
+
+- screener:  fetch_tickers_by_industries() over synthetic screener quotes
+- signals:   get_live_signals() with a synthetic price download
+- names:     company name resolution from the symbol index
+- prompt:    prompt construction
+- llm:       completion call against a canned response
+- report:    save_markdown_report()
+
+It also measures cold import time of the pipeline modules in fresh interpreters
+(import:* rows), to check that heavy dependencies (yfinance, yahooquery, openai)
+stay off the startup path until first use.
+
+Reports p50/p95 latency and peak traced memory per stage, and writes the results
+to a JSON file. Pass --baseline to compare against an earlier results file; the
+exit code is 1 if any stage's p50 regressed beyond --tolerance.
+
+Usage: python3 benchmark.py [--sizes 5 15 100 500] [--repeat 20] [--output bench_results.json]
+                            [--upstream-latency-ms 0] [--baseline old.json] [--skip-imports]
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+DEFAULT_SIZES = [5, 15, 100, 500]
+
+# Cold-import targets: name -> statements timed in a fresh interpreter
+IMPORT_TARGETS = {
+    "app_wizard": "import metrics, personas, scenario_grid, ttl_cache",  # app.py's top-level imports, minus streamlit
+    "industry_select": "import industry_select",
+    "data_fetch": "import data_fetch",
+    "gpt_utils": "import gpt_utils",
+    "gpt_utils_client": "import gpt_utils; gpt_utils.get_client()",
+}
+
+# Caches/stores must live in a scratch directory; set before the modules read their config
+_SCRATCH = tempfile.mkdtemp(prefix="ia-bench-")
+os.environ.setdefault("PRICE_STORE_PATH", os.path.join(_SCRATCH, "prices.sqlite"))
+os.environ.setdefault("SCREENER_CACHE_PATH", os.path.join(_SCRATCH, "screener.json"))
+os.environ.setdefault("SYMBOL_INDEX_PATH", os.path.join(_SCRATCH, "symbols.sqlite"))
+os.environ.setdefault("SENTIMENT_INDEX_PATH", os.path.join(_SCRATCH, "sentiment.sqlite"))
+os.environ.setdefault("SENTIMENT_CORPUS_DIR", os.path.join(_SCRATCH, "news"))
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_SCRATCH, "llm_responses.json"))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-stand-in")
+
+import numpy as np
+import pandas as pd
+
+import data_fetch
+import gpt_utils
+import industry_select
+import symbol_index
+from personas import get_personas
+from report_generator import save_markdown_report
+
+CANNED_COMPLETION = "\n\n".join(
+    f"- T{i} – Company {i}\n  Industry relevance: example.\n  Rationale: example.\n  Pros: a\n  Cons: b"
+    for i in range(4)
+) + "\n\nFinal decisions are yours."
+
+
+def universe(n):
+    """Fixed, deterministic symbol set of size n."""
+    return [f"S{i:04d}" for i in range(n)]
+
+
+class _StandIns:
+    """Local replacements for the network-bound functions, with optional fixed latency."""
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def screener_quotes(self, screener_key):
+        self._sleep()
+        return [
+            {
+                "symbol": f"S{i:04d}",
+                "longName": f"Synthetic {i} Corp",
+                "market": "us_market",
+                "marketCap": 5e9 + i * 1e7,
+                "averageDailyVolume3Month": 1e6,
+                "fullExchangeName": "NYSE",
+            }
+            for i in range(600)
+        ]
+
+    def download_adj_close(self, tickers, **kwargs):
+        self._sleep()
+        idx = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=23)
+        rng = np.random.RandomState(42)
+        steps = rng.normal(0.0005, 0.01, size=(len(idx), len(tickers)))
+        return pd.DataFrame(100 * np.exp(np.cumsum(steps, axis=0)), index=idx, columns=list(tickers))
+
+    def refresh_symbols(self, index, symbols):
+        self._sleep()
+        index.update({s: {"long_name": f"Synthetic {s}"} for s in symbols})
+
+    def complete(self, **kwargs):
+        self._sleep()
+
+        class _Msg:
+            content = CANNED_COMPLETION
+
+        class _Choice:
+            message = _Msg()
+
+        class _Resp:
+            choices = [_Choice()]
+
+        return _Resp()
+
+    def install(self):
+        industry_select._fetch_screener_quotes = self.screener_quotes
+        data_fetch._yf_download_adj_close = self.download_adj_close
+        symbol_index.SymbolIndex.refresh = lambda index, symbols: self.refresh_symbols(index, symbols)
+        gpt_utils.get_client().chat.completions.create = self.complete
+        # Every signal call re-syncs the store (delta fetch), i.e. the steady-state path
+        data_fetch.STORE_REFRESH_SECONDS = 0
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def measure(fn, repeat):
+    """
+    Runs fn() `repeat` times for latency percentiles (ms), then once more under
+    tracemalloc for peak memory (KiB), so tracing overhead does not skew timings.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "runs": repeat,
+        "p50_ms": round(_percentile(timings, 50), 3),
+        "p95_ms": round(_percentile(timings, 95), 3),
+        "peak_kib": round(peak / 1024.0, 1),
+    }
+
+
+def bench_size(n, repeat, report_dir):
+    tickers = universe(n)
+    persona = dict(get_personas()["college_student"])
+    persona["preferred_industries"] = ["Technology", "Healthcare", "Finance"]
+    industries = persona["preferred_industries"]
+    per_industry = max(1, math.ceil(n / len(industries)))
+
+    def screener():
+        industry_select._screener_cache.clear()
+        industry_select.fetch_tickers_by_industries(industries, per_industry=per_industry, max_total=n)
+
+    signals = data_fetch.get_live_signals(tickers)
+    symbol_index.get_symbol_index().update({t: {"long_name": f"Synthetic {t}"} for t in tickers})
+    names = gpt_utils._resolve_company_names(tickers)
+    prompt = gpt_utils._build_prompt(persona, signals, names)
+
+    stages = {
+        "screener": screener,
+        "signals": lambda: data_fetch.get_live_signals(tickers),
+        "names": lambda: gpt_utils._resolve_company_names(tickers),
+        "prompt": lambda: gpt_utils._build_prompt(persona, signals, names),
+        "llm": lambda: gpt_utils._complete(prompt),
+        "report": lambda: save_markdown_report("benchmark", CANNED_COMPLETION, output_dir=report_dir),
+    }
+    results = []
+    for stage, fn in stages.items():
+        row = {"stage": stage, "symbols": n}
+        row.update(measure(fn, repeat))
+        results.append(row)
+    return results
+
+
+def bench_imports(repeat):
+    """Import time (ms) of each IMPORT_TARGETS entry, each run in a fresh interpreter."""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for name, statements in IMPORT_TARGETS.items():
+        code = (
+            "import time; _t = time.perf_counter(); "
+            f"{statements}; "
+            "print((time.perf_counter() - _t) * 1000.0)"
+        )
+        timings = []
+        for _ in range(repeat):
+            out = subprocess.check_output([sys.executable, "-c", code], cwd=repo_dir, text=True)
+            timings.append(float(out.strip().splitlines()[-1]))
+        timings.sort()
+        results.append({
+            "stage": f"import:{name}",
+            "symbols": 0,
+            "runs": repeat,
+            "p50_ms": round(_percentile(timings, 50), 3),
+            "p95_ms": round(_percentile(timings, 95), 3),
+            "peak_kib": None,
+        })
+    return results
+
+
+def _git_version():
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results, baseline_path, tolerance):
+    """Prints p50 ratios against a baseline file; returns the regressed (stage, symbols) pairs."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["stage"], r["symbols"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\n===== Compared to {baseline_path} (tolerance x{tolerance}) =====\n")
+    for r in results:
+        old = baseline.get((r["stage"], r["symbols"]))
+        if not old or not old["p50_ms"]:
+            continue
+        ratio = r["p50_ms"] / old["p50_ms"]
+        flag = "  REGRESSION" if ratio > tolerance else ""
+        print(f"{r['stage']:<24} {r['symbols']:>5}  {old['p50_ms']:9.3f} -> {r['p50_ms']:9.3f} ms  x{ratio:.2f}{flag}")
+        if ratio > tolerance:
+            regressions.append((r["stage"], r["symbols"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation pipeline stages.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0,
+                        help="fixed latency added to every stand-in upstream call")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed p50 slowdown ratio")
+    parser.add_argument("--import-repeat", type=int, default=5, help="fresh interpreters per import target")
+    parser.add_argument("--skip-imports", action="store_true", help="skip the cold-import measurements")
+    args = parser.parse_args(argv)
+
+    _StandIns(args.upstream_latency_ms).install()
+    report_dir = os.path.join(_SCRATCH, "reports")
+
+    results = []
+    if not args.skip_imports:
+        results.extend(bench_imports(args.import_repeat))
+    for n in args.sizes:
+        results.extend(bench_size(n, args.repeat, report_dir))
+
+    print("\n===== Pipeline Benchmark =====\n")
+    print(f"{'stage':<24} {'symbols':>7} {'p50 ms':>10} {'p95 ms':>10} {'peak KiB':>10}")
+    for r in results:
+        peak = f"{r['peak_kib']:>10.1f}" if r["peak_kib"] is not None else f"{'-':>10}"
+        print(f"{r['stage']:<24} {r['symbols']:>7} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {peak}")
+
+    payload = {
+        "version": _git_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "upstream_latency_ms": args.upstream_latency_ms,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
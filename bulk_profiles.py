@@ -0,0 +1,275 @@
+"""
+bulk_profiles.py
+
+Overnight report generation for customer profiles read from CSV or JSONL.
+
+Each profile (risk, holding period, industries, free-text scenario and an
+optional base persona) is normalized into a canonical signature, the same key
+the wizard results use (scenario_grid.scenario_key()): risk and holding period
+snapped to the app's options, industries matched and sorted, the scenario
+lower-cased with punctuation and extra whitespace removed. Profiles with the
+same signature share one report, so they share one LLM call; profiles with the
+same industries share one ticker selection and one signal fetch.
+
+Signatures are processed on a bounded thread pool (with the RPM/TPM limiter
+from main.py's batch mode). Every finished signature is appended to
+checkpoint.jsonl in the output directory, and a rerun with the same output
+directory skips the signatures already done, so an interrupted run resumes.
+Reports go to the report store (one index record per profile, one body per
+distinct report) and manifest.csv maps each profile to its report.
+
+Input columns / keys: id, persona, risk, holding_period (or holding),
+industries ("Technology;Finance" in CSV, a list in JSONL), scenario.
+
+Key functions:
+- load_profiles(path): Profiles from a .csv or .jsonl file.
+- normalize_profile(profile): Canonical answers + signature of one profile.
+- run_bulk(path, output_dir, ...): Generates every report; returns throughput and dedupe stats.
+
+Usage: python3 main.py --profiles customers.csv [--output bulk_reports] [--concurrency 4] [--rpm 60]
+"""
+
+import csv
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+import metrics
+from personas import build_persona, get_personas
+from rate_limiter import RateLimiter
+from report_store import get_report_store
+from scenario_grid import (
+    HOLDING_PERIODS, INDUSTRIES, MAX_TICKERS, RISK_OPTIONS, TICKERS_PER_INDUSTRY, answers_for, scenario_key,
+)
+
+# Base persona for profiles that do not name one (its risk/holding are always overridden)
+DEFAULT_BASE_PERSONA = os.getenv("BULK_BASE_PERSONA", "scenario_planner")
+
+RISK_ALIASES = {
+    "very conservative": "very low", "very_low": "very low", "minimal": "very low",
+    "conservative": "low", "cautious": "low",
+    "medium": "moderate", "balanced": "moderate", "mid": "moderate",
+    "aggressive": "high", "growth": "high", "very high": "high",
+}
+
+
+def load_profiles(path: str) -> List[dict]:
+    """Rows of a .csv file (header row) or objects of a .jsonl file; ids default to the row number."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    for i, row in enumerate(rows, start=1):
+        row.setdefault("id", str(i))
+        if not row["id"]:
+            row["id"] = str(i)
+    return rows
+
+
+def _normalize_risk(value) -> str:
+    risk = " ".join(str(value or "").lower().replace("-", " ").split())
+    risk = RISK_ALIASES.get(risk, risk)
+    return risk if risk in RISK_OPTIONS else "moderate"
+
+
+def _normalize_holding(value) -> str:
+    """'2' / '1-3 years' -> '1-3 years', '5 yrs' -> '4-7 years', '10+' / '15 years' -> '10+ years'."""
+    text = str(value or "")
+    if text in HOLDING_PERIODS:
+        return text
+    years = [int(n) for n in re.findall(r"\d+", text)]
+    if not years:
+        return HOLDING_PERIODS[1]
+    longest = max(years)
+    if longest <= 3:
+        return HOLDING_PERIODS[0]
+    if longest < 10:
+        return HOLDING_PERIODS[1]
+    return HOLDING_PERIODS[2]
+
+
+_INDUSTRY_NAMES = {name.lower(): name for name in INDUSTRIES}
+
+
+def _normalize_industries(value) -> List[str]:
+    """Known industries (case-insensitive), sorted; unknown names are dropped."""
+    if isinstance(value, str):
+        value = re.split(r"[;|,]", value)
+    found = {_INDUSTRY_NAMES.get(str(v).strip().lower()) for v in value or []}
+    return sorted(i for i in found if i)
+
+
+def _normalize_scenario(value) -> str:
+    return " ".join(re.sub(r"[^\w\s%+-]", " ", str(value or "").lower()).split())
+
+
+def normalize_profile(profile: dict) -> dict:
+    """{"id", "answers", "signature"} for one input profile."""
+    persona_key = profile.get("persona") or DEFAULT_BASE_PERSONA
+    if persona_key not in get_personas():
+        persona_key = DEFAULT_BASE_PERSONA
+    answers = answers_for(
+        persona_key,
+        _normalize_scenario(profile.get("scenario")),
+        _normalize_risk(profile.get("risk") or profile.get("risk_tolerance")),
+        _normalize_holding(profile.get("holding_period") or profile.get("holding")),
+        _normalize_industries(profile.get("industries")),
+    )
+    return {"id": str(profile["id"]), "answers": answers, "signature": scenario_key(**answers)}
+
+
+def _load_checkpoint(path: str) -> Dict[str, dict]:
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    for line in text.splitlines():
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # a line cut short by the interruption
+        done[entry["signature"]] = entry
+    if text and not text.endswith("\n"):
+        # Terminate the cut-short line so the next entry starts on its own line
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n")
+    return done
+
+
+def _llm_calls() -> int:
+    """OpenAI requests made so far in this process (metrics counter, includes retries)."""
+    return int(sum(c["value"] for c in metrics.snapshot()["counters"] if c["name"] == "llm_calls"))
+
+
+def run_bulk(path: str, output_dir: str = "bulk_reports", concurrency: int = 4,
+             requests_per_minute: float = None, tokens_per_minute: float = None,
+             optimize: bool = True) -> dict:
+    """
+    Generates a report for every profile in `path`, one LLM call per distinct
+    signature, resuming from `output_dir`/checkpoint.jsonl. Returns the run stats.
+    """
+    from data_fetch import get_live_signals
+    from gpt_utils import FALLBACK_MESSAGE, build_portfolio_with_gpt
+    from industry_select import fetch_tickers_by_industries
+    import optimizer
+
+    started = time.perf_counter()
+    calls_before = _llm_calls()
+    profiles = [normalize_profile(p) for p in load_profiles(path)]
+    by_signature: Dict[str, List[dict]] = {}
+    for profile in profiles:
+        by_signature.setdefault(profile["signature"], []).append(profile)
+
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.path.join(output_dir, "checkpoint.jsonl")
+    done = _load_checkpoint(checkpoint_path)
+    pending = [s for s in by_signature if s not in done]
+    print(f"[bulk_profiles] {len(profiles)} profiles -> {len(by_signature)} signatures "
+          f"({len(by_signature) - len(pending)} already done)")
+
+    store = get_report_store(os.path.join(output_dir, "reports"))
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    checkpoint_lock = threading.Lock()
+
+    # One ticker selection + signal fetch per industry subset, shared by its signatures
+    signal_groups: Dict[tuple, dict] = {}
+    groups_lock = threading.Lock()
+    signal_fetches = 0
+
+    def signals_for(industries):
+        nonlocal signal_fetches
+        key = tuple(industries)
+        with groups_lock:
+            group = signal_groups.setdefault(key, {"lock": threading.Lock(), "signals": None})
+        with group["lock"]:
+            if group["signals"] is None:
+                tickers = fetch_tickers_by_industries(list(industries), per_industry=TICKERS_PER_INDUSTRY,
+                                                      max_total=MAX_TICKERS)
+                group["signals"] = get_live_signals(tickers)
+                with groups_lock:
+                    signal_fetches += 1
+            return group["signals"]
+
+    def generate(signature):
+        members = by_signature[signature]
+        answers = members[0]["answers"]
+        persona = build_persona(answers["persona_key"], answers["scenario"], answers["risk"],
+                                answers["holding"], answers["industries"])
+        signals = signals_for(answers["industries"])
+        allocation = optimizer.allocate_for_persona(persona, signals) if optimize else None
+        report = build_portfolio_with_gpt(persona, signals, rate_limiter=limiter, allocation=allocation)
+        if report == FALLBACK_MESSAGE:
+            return False
+        inputs = {"persona": persona, "signals": signals, "allocation": allocation}
+        record = None
+        for member in members:
+            record = store.save(f"profile_{member['id']}", report, inputs=inputs, update_latest=False)
+        entry = {"signature": signature, "content_hash": record["content_hash"], "path": record["path"],
+                 "tickers": record["tickers"]}
+        with checkpoint_lock:
+            with open(checkpoint_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            done[signature] = entry
+        return True
+
+    failed = 0
+    with metrics.span("bulk_profiles.run", profiles=len(profiles), signatures=len(pending)):
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(generate, s): s for s in pending}
+            for n, future in enumerate(as_completed(futures), start=1):
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    print(f"[bulk_profiles] Signature failed: {e}")
+                    ok = False
+                failed += not ok
+                if n % 50 == 0:
+                    print(f"[bulk_profiles] {n}/{len(pending)} signatures processed")
+
+    manifest_path = os.path.join(output_dir, "manifest.csv")
+    with open(manifest_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["profile_id", "signature", "status", "report_path", "tickers"])
+        for profile in profiles:
+            entry = done.get(profile["signature"])
+            writer.writerow([
+                profile["id"], profile["signature"], "ok" if entry else "failed",
+                entry["path"] if entry else "", ",".join(entry["tickers"]) if entry else "",
+            ])
+
+    seconds = time.perf_counter() - started
+    generated = len(pending) - failed
+    stats = {
+        "profiles": len(profiles),
+        "signatures": len(by_signature),
+        "resumed": len(by_signature) - len(pending),
+        "signatures_attempted": generated + failed,
+        "llm_calls": _llm_calls() - calls_before,
+        "signal_fetches": signal_fetches,
+        "failed_signatures": failed,
+        "dedupe_ratio": round(1 - len(by_signature) / len(profiles), 4) if profiles else 0.0,
+        "seconds": round(seconds, 2),
+        "profiles_per_second": round(len(profiles) / seconds, 2) if seconds else 0.0,
+        "manifest": manifest_path,
+    }
+    metrics.incr("bulk_profiles", len(profiles))
+    print_bulk_summary(stats)
+    return stats
+
+
+def print_bulk_summary(stats: dict):
+    print("\n===== Bulk Summary =====\n")
+    print(f"Profiles:        {stats['profiles']}")
+    print(f"Signatures:      {stats['signatures']} ({stats['resumed']} from checkpoint)")
+    print(f"Dedupe ratio:    {stats['dedupe_ratio']:.1%} of profiles shared another profile's report")
+    print(f"Signatures run:  {stats['signatures_attempted']} ({stats['failed_signatures']} failed)")
+    print(f"LLM calls:       {stats['llm_calls']}")
+    print(f"Signal fetches:  {stats['signal_fetches']}")
+    print(f"Throughput:      {stats['profiles_per_second']} profiles/s over {stats['seconds']}s")
+    print(f"Manifest:        {stats['manifest']}")
@@ -0,0 +1,172 @@
+"""
+circuit_breaker.py
+
+Shared circuit breakers for the upstreams (Yahoo Finance / Yahoo screener, and
+OpenAI). After `failure_threshold` consecutive failures a breaker opens and
+every caller fails immediately with CircuitOpenError (and takes its usual
+fallback path) instead of waiting on its own network timeout. After a jittered
+cool-down one probe call is let through (half-open): success closes the
+breaker, failure opens it again.
+
+Failed calls are retried with jittered exponential backoff, but only while the
+upstream's retry budget lasts: every call adds `retry_ratio` of a retry token
+(up to `retry_budget`), every retry spends one, so retries stay a small fraction
+of traffic during an outage.
+
+Key functions:
+- get_breaker(upstream): The shared breaker for "yahoo" or "openai".
+- CircuitBreaker.call(fn): Runs fn() through the breaker, with budgeted retries.
+- CircuitBreaker.guard(): Context manager for calls that cannot be retried (streams).
+- states(): Current state of every breaker (e.g. for a health endpoint).
+"""
+
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import metrics
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", 30))
+
+# Per-upstream settings. OpenAI's client already retries on its own, so the
+# breaker does not add retries on top.
+UPSTREAM_SETTINGS = {
+    "yahoo": {"max_retries": 2},
+    "openai": {"max_retries": 0},
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+                 reset_timeout: float = CIRCUIT_RESET_SECONDS, max_retries: int = 2,
+                 retry_ratio: float = 0.2, retry_budget: float = 10.0,
+                 backoff_base: float = 0.2, backoff_cap: float = 2.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_retries = max_retries
+        self.retry_ratio = retry_ratio
+        self.retry_budget = retry_budget
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.state = CLOSED
+        self.failures = 0
+        self._retry_tokens = retry_budget
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _allow(self) -> bool:
+        """Whether a call may go out now; claims the probe slot when half-open."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() >= self._open_until:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def _on_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"[circuit_breaker] {self.name} recovered; closing circuit")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def _on_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"[circuit_breaker] {self.name} failing ({self.failures} in a row); "
+                          f"opening circuit for ~{self.reset_timeout:.0f}s")
+                    metrics.incr("circuit_opened", upstream=self.name)
+                self.state = OPEN
+                # Jittered cool-down, so processes sharing an upstream do not probe in lockstep
+                self._open_until = time.monotonic() + self.reset_timeout * random.uniform(0.8, 1.2)
+            self._probing = False
+
+    def _take_retry_token(self) -> bool:
+        with self._lock:
+            if self._retry_tokens >= 1:
+                self._retry_tokens -= 1
+                return True
+            return False
+
+    def _reject(self):
+        metrics.incr("circuit_rejections", upstream=self.name)
+        raise CircuitOpenError(f"{self.name} circuit is open")
+
+    @contextmanager
+    def guard(self):
+        """Fails fast when open; otherwise records the block's success or failure."""
+        if not self._allow():
+            self._reject()
+        try:
+            yield
+        except Exception:
+            self._on_failure()
+            raise
+        except BaseException:
+            # Abandoned (e.g. a stream closed early): no verdict, just free the probe slot
+            with self._lock:
+                self._probing = False
+            raise
+        self._on_success()
+
+    def call(self, fn):
+        """fn() through the breaker, retried with jittered backoff while the retry budget lasts."""
+        with self._lock:
+            self._retry_tokens = min(self.retry_budget, self._retry_tokens + self.retry_ratio)
+        attempt = 0
+        while True:
+            try:
+                with self.guard():
+                    return fn()
+            except CircuitOpenError:
+                raise
+            except Exception:
+                if attempt >= self.max_retries or self.state != CLOSED or not self._take_retry_token():
+                    raise
+            attempt += 1
+            metrics.incr("retries", upstream=self.name)
+            # "Full jitter" backoff
+            time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+            self._retry_tokens = self.retry_budget
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Shared breaker per upstream name, created with its UPSTREAM_SETTINGS on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = _breakers[upstream] = CircuitBreaker(upstream, **UPSTREAM_SETTINGS.get(upstream, {}))
+        return breaker
+
+
+def states() -> Dict[str, dict]:
+    with _breakers_lock:
+        return {name: {"state": b.state, "failures": b.failures} for name, b in _breakers.items()}
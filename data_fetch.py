@@ -7,13 +7,40 @@ network errors or unavailable data.
 
 Key functions:
 - get_price_return(): Fetches recent price change as a return percentage.
-- get_sentiment_score(): Placeholder for sentiment analysis (currently static).
-- get_live_signals(): Combines return and sentiment data for a set of tickers.
+- get_price_returns(): Batched variant that downloads many tickers in one request.
+- get_sentiment_score(): Sentiment from the local sentiment index (see sentiment_index.py).
+- get_sentiment_scores(): Batched variant; one in-memory lookup per ticker.
+- get_live_signals(): Combines return and sentiment data for a set of tickers (as a SignalTable).
+- compute_signal_metrics(): Vectorized multi-metric engine over a date x ticker price
+  matrix (multi-window returns, volatility, max drawdown, momentum, beta vs SPY).
+- get_signal_metrics(): Runs the engine on stored prices for a set of tickers.
+- get_price_history(): Stored (synced) date x ticker adjusted closes for a period.
+- sync_price_store(): Downloads only the bars missing from the local store.
+- ffill_matrix(): Forward-fills gaps in a date x ticker price matrix.
+
+Prices are kept in a local store (see price_store.py). Repeat requests only
+download the bars missing since the last stored date, and the stored prices
+serve as last-known-good data when Yahoo is unreachable.
 """
 
-import yfinance as yf
+import io
+import logging
+import os
+import threading
+import time
+import warnings
+from datetime import date, timedelta
+
+import numpy as np
 import pandas as pd
 
+import metrics
+import replay
+from circuit_breaker import get_breaker
+from price_store import get_price_store
+from sentiment_index import get_sentiment_index
+from signal_table import SignalTable
+
 # Optional fallback values for offline mode or demo stability
 fallback_returns = {
     "AAPL": 0.03,
@@ -23,7 +50,7 @@ fallback_returns = {
     "VOO": 0.015
 }
 
-# Optional fallback sentiment scores (can be refined later)
+# Fallback sentiment scores for tickers the local sentiment index does not cover
 fallback_sentiments = {
     "AAPL": 0.6,
     "TSLA": 0.8,
@@ -32,39 +59,388 @@ fallback_sentiments = {
     "VOO": 0.85
 }
 
-def get_price_return(ticker, period="1mo"):
+# Calendar days covered by each yfinance-style period string
+PERIOD_DAYS = {
+    "5d": 7,
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+}
+
+# Tickers fetched more recently than this are served from the store without a network call
+STORE_REFRESH_SECONDS = 15 * 60
+
+# Signal engine settings: trailing return windows in trading days, annualization
+# factor, days skipped at the end of the momentum window, and the beta benchmark
+SIGNAL_WINDOWS = {"return_5d": 5, "return_1mo": 21, "return_3mo": 63}
+TRADING_DAYS_PER_YEAR = 252
+MOMENTUM_SKIP_DAYS = 5
+BENCHMARK_TICKER = "SPY"
+
+# get_live_signals() default: add the signal engine metrics (volatility, drawdown,
+# momentum, beta) so local pre-ranking can use them; "0" keeps return + sentiment only
+DETAILED_SIGNALS = os.getenv("DETAILED_SIGNALS", "1").lower() not in ("0", "false", "no")
+
+def _download_adj_close(tickers: list[str], **kwargs) -> pd.DataFrame:
+    """
+    Downloads tickers in one multi-symbol request and returns the wide
+    (date x ticker) adjusted close frame. Goes through the record/replay layer
+    and the Yahoo circuit breaker (fails fast while Yahoo is known to be down).
+    Network failures (which yfinance reports instead of raising) count against
+    the breaker. Raises ValueError if Yahoo answers without data (e.g. delisted
+    tickers); that is checked outside the breaker, so it is neither retried nor
+    counted as an upstream failure.
+    """
+    # Replay fixtures key start-based downloads on the window length rather than the
+    # start date (which moves every day), so full windows and deltas stay apart
+    key = {"tickers": sorted(tickers)}
+    if "start" in kwargs:
+        key["days"] = (date.today() - date.fromisoformat(str(kwargs["start"])[:10])).days
+    else:
+        key["period"] = kwargs.get("period")
+    with metrics.span("data_fetch.download", symbols=len(tickers)):
+        prices = replay.call(
+            "yahoo", key, lambda: get_breaker("yahoo").call(lambda: _yf_download_adj_close(tickers, **kwargs)),
+            encode=lambda prices: prices.to_json(orient="split", date_format="iso"),
+            decode=lambda raw: pd.read_json(io.StringIO(raw), orient="split"),
+        )
+    if prices.empty:
+        raise ValueError("Insufficient data returned")
+    return prices
+
+# yfinance reports per-ticker failures instead of raising; these mark network
+# trouble, as opposed to delisted tickers or windows without bars
+_TRANSPORT_ERROR_MARKERS = (
+    "dnserror", "could not resolve", "curl:", "failed to perform", "connection", "timeout",
+    "timed out", "ratelimit", "rate limit", "too many requests",
+)
+
+class _DownloadErrors(logging.Handler):
+    """Collects the failure messages yfinance logs from the calling thread during one download."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.messages = []
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            self.messages.append(record.getMessage())
+
+def _yf_download_adj_close(tickers: list[str], **kwargs) -> pd.DataFrame:
+    """
+    yf.download() adjusted closes. yfinance swallows network errors and returns
+    an empty frame, so when nothing came back and the reported failures look
+    like transport errors this raises ConnectionError (counted and retried by
+    the breaker). Any other empty answer is returned as an empty frame.
+    """
+    import yfinance as yf  # deferred: heavy import, only needed when the store is stale
+    import yfinance.shared as yf_shared
+
+    errors = _DownloadErrors()
+    yf_logger = logging.getLogger("yfinance")
+    yf_logger.addHandler(errors)
+    try:
+        data = yf.download(tickers, auto_adjust=False, group_by="column",
+                           threads=True, progress=False, **kwargs)
+    finally:
+        yf_logger.removeHandler(errors)
+
+    if data.empty or "Adj Close" not in data.columns.get_level_values(0):
+        # Older yfinance versions keep the failures in yfinance.shared._ERRORS instead of logging them
+        reported = errors.messages + [str(e) for e in getattr(yf_shared, "_ERRORS", {}).values()]
+        transport = [m for m in reported if any(k in m.lower() for k in _TRANSPORT_ERROR_MARKERS)]
+        if transport:
+            raise ConnectionError(f"Yahoo download failed: {transport[0]}")
+        return pd.DataFrame()  # a valid (empty) answer; the caller raises outside the breaker
+
+    prices = data["Adj Close"]
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame(name=tickers[0])
+    return prices
+
+def _returns_from_frame(prices: pd.DataFrame) -> pd.Series:
+    """
+    First-to-last return per column of a wide price frame, in one vectorized pass.
+    Columns with fewer than 2 price points come back as NaN.
+    """
+    if prices.empty:
+        return pd.Series(dtype=float)
+    first = prices.bfill().iloc[0]
+    last = prices.ffill().iloc[-1]
+    valid = prices.notna().sum() >= 2
+    return ((last / first) - 1).where(valid)
+
+def _fill_fallbacks(tickers: list[str], pct_returns: pd.Series) -> dict:
+    returns = {}
+    for ticker in tickers:
+        ret = pct_returns.get(ticker)
+        if ret is None or pd.isna(ret):
+            print(f"⚠️ Using fallback for {ticker}: Not enough price points")
+            metrics.incr("fallbacks", stage="price_return")
+            returns[ticker] = 0.02  # fallback return
+        else:
+            returns[ticker] = float(ret)
+    return returns
+
+def sync_price_store(tickers: list[str], period="1mo"):
+    """
+    Brings the local store up to date for `tickers`, fetching only what is missing.
+    Tickers whose stored history does not cover the window get the full window
+    (even if fetched recently for a shorter one); the rest are fetched from
+    their last stored date (inclusive, so a partial intraday bar gets replaced)
+    unless they were fetched within STORE_REFRESH_SECONDS.
+    Network errors are reported and leave the stored data untouched.
+    """
+    store = get_price_store()
+    now = time.time()
+    window_start = (date.today() - timedelta(days=PERIOD_DAYS.get(period, 31))).isoformat()
+    ranges = store.date_range(tickers)
+    requested = store.requested_from(tickers)
+    # Stored history must reach back to (roughly) the window start; allow for weekends/holidays.
+    # A ticker already requested from the window start simply has no older history.
+    covered_from = (date.fromisoformat(window_start) + timedelta(days=5)).isoformat()
+
+    fetched = store.fetched_at(tickers)
+    fresh = {t for t in tickers if now - fetched.get(t, 0) <= STORE_REFRESH_SECONDS}
+
+    def covered(t):
+        if t not in ranges:
+            return False
+        first, last = ranges[t]
+        return last >= window_start and (first <= covered_from or requested.get(t, "9999") <= window_start)
+
+    # Recently requested for this whole window: the store already has everything upstream had
+    full = [t for t in tickers
+            if not covered(t) and not (t in fresh and requested.get(t, "9999") <= window_start)]
+    delta = [t for t in tickers if t not in full and t not in fresh and t in ranges]
+    metrics.incr("cache_hits", len(tickers) - len(full) - len(delta), cache="price_store")
+    metrics.incr("cache_misses", len(full) + len(delta), cache="price_store")
+
+    batches = []
+    if full:
+        batches.append((full, window_start))
+    if delta:
+        batches.append((delta, min(ranges[t][1] for t in delta)))
+
+    for group, start in batches:
+        try:
+            prices = _download_adj_close(group, start=start)
+            store.upsert(prices)
+            store.mark_fetched(group, when=now, requested_from=start if group is full else None)
+        except Exception as e:
+            print(f"⚠️ Price store refresh failed for {', '.join(group)}: {e}")
+            metrics.incr("fallbacks", len(group), stage="price_store_stale")
+
+def _stored_returns(tickers: list[str], period="1mo") -> dict:
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
     try:
-        data = yf.download(ticker, period=period, auto_adjust=False, threads=False)
+        with metrics.span("data_fetch.sync_price_store"):
+            sync_price_store(tickers, period)
+        with metrics.span("data_fetch.load_window"):
+            prices = get_price_store().load_window(tickers, PERIOD_DAYS.get(period, 31))
+        pct_returns = _returns_from_frame(prices)
+    except Exception as e:
+        print(f"⚠️ Price store unavailable: {e}")
+        pct_returns = pd.Series(dtype=float)
+    return _fill_fallbacks(tickers, pct_returns)
+
+def get_price_return(ticker, period="1mo", use_store=True):
+    if use_store:
+        return _stored_returns([ticker], period=period)[ticker]
 
-        if data.empty or "Adj Close" not in data.columns:
-            raise ValueError("Insufficient data returned")
+    try:
+        data = _download_adj_close([ticker], period=period)
 
         # Drop nulls and ensure enough data points
-        prices = data["Adj Close"].dropna()
+        prices = data.iloc[:, 0].dropna()
         if len(prices) < 2:
             raise ValueError("Not enough price points")
 
         pct_return = (prices.iloc[-1] / prices.iloc[0]) - 1
-        return float(pct_return.iloc[0]) if isinstance(pct_return, pd.Series) else float(pct_return)
+        return float(pct_return)
 
 
     except Exception as e:
         print(f"⚠️ Using fallback for {ticker}: {e}")
+        metrics.incr("fallbacks", stage="price_return")
         return 0.02  # fallback return
 
-def get_live_signals(tickers: list[str]) -> dict:
+def get_price_returns(tickers: list[str], period="1mo", use_store=True) -> dict:
     """
-    Combines returns + fallback sentiment for a list of tickers.
+    Fetches returns for many tickers with a single multi-symbol download.
+    Returns are computed in one pass over the wide (date x ticker) price frame.
+    Tickers missing from the batch get the same fallback as get_price_return().
+    With use_store=True only bars missing from the local store are downloaded.
+    """
+    if use_store:
+        return _stored_returns(tickers, period=period)
+
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+
+    try:
+        prices = _download_adj_close(tickers, period=period)
+        pct_returns = _returns_from_frame(prices)
+    except Exception as e:
+        print(f"⚠️ Batched download failed ({e}); fetching tickers one by one")
+        metrics.incr("retries", len(tickers), stage="price_download")
+        return {ticker: get_price_return(ticker, period=period, use_store=False) for ticker in tickers}
+
+    return _fill_fallbacks(tickers, pct_returns)
+
+def ffill_matrix(prices: np.ndarray) -> np.ndarray:
+    """Forward-fills NaNs down each column; leading NaNs stay NaN."""
+    rows = np.arange(prices.shape[0])[:, None]
+    idx = np.where(np.isnan(prices), 0, rows)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return prices[idx, np.arange(prices.shape[1])]
+
+def compute_signal_metrics(prices, tickers: list[str] = None, benchmark: str = BENCHMARK_TICKER,
+                           windows: dict = SIGNAL_WINDOWS, momentum_skip: int = MOMENTUM_SKIP_DAYS) -> dict:
+    """
+    Computes every metric for every ticker in one vectorized pass over a
+    date x ticker price matrix (a wide DataFrame, or a 2-D array plus `tickers`).
+
+    Returns {metric: 1-D array aligned with tickers}:
+    - one trailing return per `windows` entry (NaN if history is too short)
+    - volatility: annualized std of daily log returns
+    - max_drawdown: worst peak-to-trough decline (<= 0)
+    - momentum: return from the first price to `momentum_skip` days before the last
+    - beta: vs the `benchmark` column (NaN if it is not in the matrix)
+    """
+    if isinstance(prices, pd.DataFrame):
+        tickers = list(prices.columns)
+        prices = prices.to_numpy(dtype=float)
+    prices = np.asarray(prices, dtype=float)
+    n_days, n_tickers = prices.shape
+    cols = np.arange(n_tickers)
+    if n_days < 2:
+        # Nothing to compute from (e.g. empty store and Yahoo down): every metric is missing
+        names = [*windows, "volatility", "max_drawdown", "momentum", "beta"]
+        return {name: np.full(n_tickers, np.nan) for name in names}
+
+    filled = ffill_matrix(prices)
+    last = filled[-1] if n_days else np.full(n_tickers, np.nan)
+    out = {}
+
+    with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+
+        for name, k in windows.items():
+            out[name] = last / filled[-1 - k] - 1 if n_days > k else np.full(n_tickers, np.nan)
+
+        log_returns = np.diff(np.log(filled), axis=0)
+        out["volatility"] = np.nanstd(log_returns, axis=0, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)
+
+        running_peak = np.fmax.accumulate(filled, axis=0)
+        out["max_drawdown"] = np.nanmin(filled / running_peak - 1, axis=0)
+
+        first_valid = np.argmax(~np.isnan(prices), axis=0)
+        first = prices[first_valid, cols]
+        out["momentum"] = (filled[-1 - momentum_skip] / first - 1) if n_days > momentum_skip \
+            else np.full(n_tickers, np.nan)
+
+        beta = np.full(n_tickers, np.nan)
+        if tickers is not None and benchmark in tickers and len(log_returns):
+            bench = log_returns[:, tickers.index(benchmark)][:, None]
+            valid = ~np.isnan(log_returns) & ~np.isnan(bench)
+            n = valid.sum(axis=0)
+            x = np.where(valid, log_returns, 0.0)
+            b = np.where(valid, bench, 0.0)
+            cov = (x * b).sum(axis=0) - x.sum(axis=0) * b.sum(axis=0) / n
+            var = (b * b).sum(axis=0) - b.sum(axis=0) ** 2 / n
+            beta = np.where(n > 2, cov / var, np.nan)
+        out["beta"] = beta
+
+    return out
+
+def get_price_history(tickers: list[str], period="1y") -> pd.DataFrame:
+    """
+    Wide (date x ticker) adjusted closes covering `period`, from the local store
+    after syncing it. Columns follow `tickers`; an empty frame if the store is unusable.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    try:
+        sync_price_store(tickers, period)
+        prices = get_price_store().load_window(tickers, PERIOD_DAYS.get(period, 366))
+    except Exception as e:
+        print(f"⚠️ Price store unavailable: {e}")
+        prices = pd.DataFrame()
+    return prices.reindex(columns=tickers)
+
+def get_signal_table(tickers: list[str], period="6mo", benchmark: str = BENCHMARK_TICKER) -> SignalTable:
+    """
+    Runs compute_signal_metrics() on stored prices (synced first) for `tickers`.
+    The benchmark is loaded alongside for beta. Returns one row per ticker.
+    """
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return SignalTable([], {})
+    universe = tickers + ([benchmark] if benchmark and benchmark not in tickers else [])
+
+    with metrics.span("data_fetch.get_signal_metrics", symbols=len(universe)):
+        prices = get_price_history(universe, period)
+        values = compute_signal_metrics(prices, benchmark=benchmark)
+
+    n = len(tickers)  # the benchmark, when added, is the last row
+    return SignalTable(tickers, {m: v[:n] for m, v in values.items()})
+
+def get_signal_metrics(tickers: list[str], period="6mo", benchmark: str = BENCHMARK_TICKER) -> dict:
+    """get_signal_table() as {ticker: {metric: float or None}}."""
+    return get_signal_table(tickers, period, benchmark).to_dict()
+
+def get_sentiment_scores(tickers: list[str]) -> dict:
+    """
+    Sentiment (0..1) per ticker from the local sentiment index; tickers without
+    indexed documents get fallback_sentiments, then a neutral 0.5.
+    """
+    try:
+        scores = get_sentiment_index().scores(tickers)
+    except Exception as e:
+        print(f"⚠️ Sentiment index unavailable: {e}")
+        scores = {}
+    return {t: scores.get(t, fallback_sentiments.get(t, 0.5)) for t in tickers}
+
+def get_sentiment_score(ticker: str) -> float:
+    return get_sentiment_scores([ticker])[ticker]
+
+def get_live_signals(tickers: list[str], batched: bool = True, detailed: bool = None) -> SignalTable:
+    """
+    Combines returns + indexed sentiment for a list of tickers.
     Filters out negative returns to avoid recommending losing stocks.
+    With batched=True all prices come from one multi-ticker download.
+    With detailed=True (the default, see DETAILED_SIGNALS) each entry also
+    carries the signal engine metrics (see compute_signal_metrics()) and
+    "return" is the 1-month trailing return.
+    Returns a SignalTable, which also reads like {ticker: {"return", "sentiment", ...}}.
     """
-    signals = {}
-    for ticker in tickers:
-        ret = get_price_return(ticker)
-        if ret <= 0:
-            print(f"⏭ Skipping {ticker} due to negative return: {ret:.2%}")
-            continue
-        signals[ticker] = {
-            "return": ret,
-            "sentiment": fallback_sentiments.get(ticker, 0.5)
-        }
-    return signals
\ No newline at end of file
+    detailed = DETAILED_SIGNALS if detailed is None else detailed
+    with metrics.span("data_fetch.get_live_signals", symbols=len(tickers)):
+        if detailed:
+            table = get_signal_table(tickers)
+            nan_returns = pd.Series(table.column("return_1mo"), index=table.symbols)
+            returns = _fill_fallbacks(table.symbols, nan_returns)
+        elif batched:
+            returns = get_price_returns(tickers)
+        else:
+            returns = {ticker: get_price_return(ticker) for ticker in tickers}
+
+    symbols = list(returns)
+    sentiments = get_sentiment_scores(symbols)
+    columns = {
+        "return": np.fromiter(returns.values(), dtype=float, count=len(symbols)),
+        "sentiment": np.fromiter((sentiments[t] for t in symbols), dtype=float, count=len(symbols)),
+    }
+    signals = table.with_columns(columns) if detailed else SignalTable(symbols, columns)
+
+    keep = columns["return"] > 0
+    for i in np.flatnonzero(~keep):
+        print(f"⏭ Skipping {symbols[i]} due to negative return: {columns['return'][i]:.2%}")
+    return signals.filter(keep)
\ No newline at end of file
@@ -7,104 +7,400 @@ recommendations based on the user persona and stock signals.
 Key function:
 - build_portfolio_with_gpt(): Sends portfolio-building prompt to GPT-3.5-turbo,
   receives rationale-based stock recommendations and returns them as a string.
+  Responses are cached on a hash of the prompt and model parameters, so repeat
+  requests return without an API call (see llm_cache_stats()).
+- stream_portfolio_with_gpt(): Same request, streamed; yields each asset block
+  (blank-line separated) as soon as it is complete.
+- get_client(): The shared OpenAI client, created (and `openai` imported) on first use.
+
+Before the prompt is built, candidates are pre-ranked locally (see ranking.py)
+and only the top PRERANK_TOP_N are sent, one compact numeric row each.
+When an allocation from optimizer.py is passed, the holdings and weights are
+already decided and the model is only asked to explain them.
 """
 
 # gpt_utils.py
+import hashlib
+import json
 import os
-from openai import OpenAI
+import threading
+import numpy as np
 from dotenv import load_dotenv
 
-# optional: resolve company names for nicer bullets
-import yfinance as yf
+# resolve company names for nicer bullets from the local symbol index
+import metrics
+import replay
+from circuit_breaker import get_breaker
+from ranking import PRERANK_TOP_N, rank_candidates
+from signal_table import SignalTable
+from symbol_index import get_symbol_index
+from ttl_cache import TTLCache
 
 load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+# Built lazily by get_client(); importing `openai` alone costs more than the rest of the app
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Shared OpenAI client, constructed on first use and reused afterwards."""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+                client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return client
+
+MODEL = "gpt-3.5-turbo"  # low-cost model per your constraint
+TEMPERATURE = 0.5        # slightly lower for tighter, more factual outputs
+
+FALLBACK_MESSAGE = "Fallback: Could not generate portfolio explanation."
+
+# Rough completion size used when reserving tokens from a rate limiter
+COMPLETION_TOKEN_ESTIMATE = 700
+
+# Response cache. Tolerances (as fractions, e.g. 0.005 = 0.5pp) snap returns and
+# sentiment to a grid before hashing, so near-identical signals share an entry.
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 24 * 60 * 60))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", 512))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_responses.json"))
+LLM_CACHE_RETURN_TOLERANCE = float(os.getenv("LLM_CACHE_RETURN_TOLERANCE", 0))
+LLM_CACHE_SENTIMENT_TOLERANCE = float(os.getenv("LLM_CACHE_SENTIMENT_TOLERANCE", 0))
+
+# One "TICKER|Name|ret|sent" row per candidate instead of a sentence-style row
+PROMPT_COMPACT = os.getenv("PROMPT_COMPACT", "1").lower() not in ("0", "false", "no")
+
+_response_cache = TTLCache(max_entries=LLM_CACHE_SIZE, ttl_seconds=LLM_CACHE_TTL, path=LLM_CACHE_PATH)
+
+def llm_cache_stats() -> dict:
+    """Entry count and hit/miss counters of the response cache."""
+    return _response_cache.stats()
 
 def _resolve_company_names(tickers):
     """
-    Best-effort mapping from ticker -> company long name using yfinance.
-    Falls back to the ticker if not available or on error.
+    Best-effort mapping from ticker -> company long name using the local symbol index.
+    Falls back to the ticker if not indexed; missing/stale symbols are refreshed
+    in the background so the next prompt gets the proper name.
+    """
+    try:
+        with metrics.span("gpt_utils.resolve_names", symbols=len(tickers)):
+            index = get_symbol_index()
+            index.refresh_async(tickers)
+            return index.names(tickers)
+    except Exception:
+        return {t: t for t in tickers}
+
+def _prerank(persona, stock_signals, top_n=None):
+    """
+    The top_n (default PRERANK_TOP_N) candidates for this persona, best first.
+    Records the prompt tokens saved against sending every candidate.
+    """
+    top_n = PRERANK_TOP_N if top_n is None else top_n
+    if top_n <= 0 or len(stock_signals) <= top_n:
+        return stock_signals
+    try:
+        with metrics.span("gpt_utils.prerank", candidates=len(stock_signals), keep=top_n):
+            index = get_symbol_index()
+            sectors = {t: (index.get(t) or {}).get("sector") for t in stock_signals}
+            kept = rank_candidates(persona, stock_signals, top_n, sectors=sectors)
+            names = index.names(stock_signals)
+            saved = (len(_build_prompt(persona, stock_signals, names))
+                     - len(_build_prompt(persona, kept, names))) // 4
+        metrics.incr("prompt_tokens_saved", saved)
+        print(f"[gpt_utils] Pre-ranking kept {len(kept)}/{len(stock_signals)} candidates, "
+              f"~{saved} prompt tokens saved")
+        return kept
+    except Exception as e:
+        print(f"[gpt_utils] Pre-ranking failed, sending all candidates: {e}")
+        return stock_signals
+
+def _snap(value, tolerance):
+    """Rounds value to the nearest multiple of tolerance (no-op when tolerance is 0)."""
+    if not tolerance:
+        return value
+    return round(round(value / tolerance) * tolerance, 10)
+
+def _signal_columns(stock_signals):
+    """(symbols, expected return % array, sentiment % array), with safe defaults for missing values."""
+    table = SignalTable.from_signals(stock_signals)
+    exp_ret = np.nan_to_num(table.column("return") * 100.0, nan=0.0)
+    sent = np.nan_to_num(table.column("sentiment") * 100.0, nan=50.0)
+    return table.symbols, exp_ret, sent
+
+def _holdings(stock_signals, allocation):
+    """The allocation's tickers (weight order) that have signals, as a SignalTable."""
+    table = SignalTable.from_signals(stock_signals)
+    return table.select([t for t in allocation["weights"] if t in table])
+
+def _persona_header(persona):
+    """Opening lines shared by both prompts: the assistant role and the investor profile."""
+    persona_name = persona.get("name", "Investor")
+    persona_goals = persona.get("goal", "grow wealth")
+    scenario = persona.get("scenario", "balanced long-term growth")
+    risk = persona.get("risk_tolerance", persona.get("risk", "moderate"))
+    holding = persona.get("holding_period", "5+ years")
+    industries = persona.get("preferred_industries", [])
+    industries_str = ", ".join(industries) if industries else "no specific industries selected"
+    return (
+        "You are a financial assistant helping a beginner investor.\n\n"
+        f"Investor: {persona_name}\n"
+        f"Scenario: {scenario}\n"
+        f"Goal: {persona_goals}\n"
+        f"Risk tolerance: {risk}\n"
+        f"Holding period: {holding}\n"
+        f"Preferred industries: {industries_str}\n\n"
+    )
+
+def _build_prompt(persona, stock_signals, company_names, allocation=None):
+    if allocation is not None:
+        return _build_explain_prompt(persona, stock_signals, company_names, allocation)
+
+    # Build compact stock descriptions with numbers for the model
+    # Example: "AAPL|Apple Inc.|3.2|78" (or "AAPL (Apple Inc.): expected_return=3.2%, sentiment=78%")
+    stock_rows = ["ticker|name|expected_return%|sentiment%"] if PROMPT_COMPACT else []
+    symbols, exp_rets, sents = _signal_columns(stock_signals)
+    for t, exp_ret, sent in zip(symbols, exp_rets.tolist(), sents.tolist()):
+        if PROMPT_COMPACT:
+            stock_rows.append(f"{t}|{company_names.get(t, t)}|{exp_ret:.1f}|{sent:.0f}")
+        else:
+            stock_rows.append(f"{t} ({company_names.get(t, t)}): expected_return={exp_ret:.1f}%, sentiment={sent:.0f}%")
+
+    stock_block = "\n".join(stock_rows)
+
+    # Prompt: short, numeric, and industry-tied relevance
+    return (
+        _persona_header(persona) +
+        f"Available stocks and funds (all have positive recent returns) with predicted returns and sentiment scores:\n"
+        f"{stock_block}\n\n"
+        "Task: Recommend a 3–4 asset portfolio tailored to this investor and industries. "
+        "Be concise, numerically grounded, and beginner-friendly.\n\n"
+        "For EACH recommended asset, output exactly this Markdown shape:\n"
+        "- TICKER – Company Name\n"
+        "  Industry relevance: <max 20 words tying the company to the selected industry via a product/service/market role>\n"
+        "  Rationale: 2–3 sentences; include expected_return (%) and sentiment (%) from above; keep it plain-English.\n"
+        "  Pros: <1–2 short pros>\n"
+        "  Cons: <1–2 short cons>\n"
+        "  Recent performance: brief 1-year or 5-year context if useful (concise)\n\n"
+        "Constraints:\n"
+        "- Use the candidate list above; prioritize those aligned with the selected industries.\n"
+        "- Keep each 'Industry relevance' to 20 words or fewer—specific and concrete (e.g., flagship product, dominant segment, ETF coverage of sector).\n"
+        "- Keep paragraphs short and readable; avoid long blocks of text.\n"
+        "- End with one sentence reminding the user that final decisions are theirs."
+    )
+
+def _build_explain_prompt(persona, stock_signals, company_names, allocation):
+    """Prompt asking the model to explain an allocation that is already computed."""
+    weights = allocation["weights"]
+    stock_rows = ["ticker|name|weight%|expected_return%|sentiment%"]
+    symbols, exp_rets, sents = _signal_columns(stock_signals)
+    for t, exp_ret, sent in zip(symbols, exp_rets.tolist(), sents.tolist()):
+        stock_rows.append(f"{t}|{company_names.get(t, t)}|{weights[t] * 100:.0f}|{exp_ret:.1f}|{sent:.0f}")
+    stock_block = "\n".join(stock_rows)
+
+    return (
+        _persona_header(persona) +
+        "This portfolio was built by a mean-variance optimizer for the investor's risk tolerance "
+        f"(expected annual return {allocation['expected_return'] * 100:.1f}%, "
+        f"annual volatility {allocation['volatility'] * 100:.1f}%):\n"
+        f"{stock_block}\n\n"
+        "Task: Explain this portfolio to the investor. Do NOT add, remove or replace assets "
+        "and do NOT change the weights. Be concise, numerically grounded, and beginner-friendly.\n\n"
+        "For EACH asset, in the order above, output exactly this Markdown shape:\n"
+        "- TICKER – Company Name (weight%)\n"
+        "  Industry relevance: <max 20 words tying the company to the selected industry via a product/service/market role>\n"
+        "  Rationale: 2–3 sentences on why it fits at this weight; include expected_return (%) and sentiment (%) from above.\n"
+        "  Pros: <1–2 short pros>\n"
+        "  Cons: <1–2 short cons>\n\n"
+        "Constraints:\n"
+        "- Keep each 'Industry relevance' to 20 words or fewer—specific and concrete.\n"
+        "- Keep paragraphs short and readable; avoid long blocks of text.\n"
+        "- End with one sentence reminding the user that final decisions are theirs."
+    )
+
+def _cache_key(persona, stock_signals, allocation=None):
     """
-    names = {}
-    for t in tickers:
-        try:
-            info = yf.Ticker(t).info  # may be slow; we only call for the small set we pass in
-            long_name = info.get("longName") or info.get("shortName") or t
-            names[t] = long_name
-        except Exception:
-            names[t] = t
-    return names
-
-def build_portfolio_with_gpt(persona, stock_signals):
+    Hash of the normalized prompt + model parameters. Signals are snapped to the
+    configured tolerances and whitespace is collapsed before hashing. Tickers
+    stand in for company names, so the key does not change when the symbol
+    index resolves a name in the background.
+    """
+    snapped = {}
+    symbols, exp_rets, sents = _signal_columns(stock_signals)
+    for t, exp_ret, sent in sorted(zip(symbols, exp_rets.tolist(), sents.tolist())):
+        snapped[t] = {
+            "return": _snap(exp_ret / 100.0, LLM_CACHE_RETURN_TOLERANCE),
+            "sentiment": _snap(sent / 100.0, LLM_CACHE_SENTIMENT_TOLERANCE),
+        }
+    prompt = " ".join(_build_prompt(persona, snapped, {}, allocation).split())
+    payload = json.dumps({"model": MODEL, "temperature": TEMPERATURE, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _estimate_tokens(prompt):
+    """Prompt (~4 chars per token) plus expected completion tokens."""
+    return len(prompt) // 4 + COMPLETION_TOKEN_ESTIMATE
+
+def _record_usage(usage):
+    if usage is None:
+        return
+    metrics.incr("llm_tokens", getattr(usage, "prompt_tokens", 0) or 0, direction="sent")
+    metrics.incr("llm_tokens", getattr(usage, "completion_tokens", 0) or 0, direction="received")
+
+def _cached_response(key):
+    cached = _response_cache.get(key)
+    metrics.incr("cache_hits" if cached is not None else "cache_misses", cache="llm")
+    return cached
+
+def _complete(prompt):
+    """Non-streaming completion through the record/replay layer."""
+    def fetch():
+        metrics.incr("llm_calls", model=MODEL)
+        response = get_client().chat.completions.create(
+            model=MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=TEMPERATURE,
+        )
+        _record_usage(getattr(response, "usage", None))
+        return response.choices[0].message.content.strip()
+
+    key = {"model": MODEL, "temperature": TEMPERATURE, "prompt": prompt}
+    with metrics.span("gpt_utils.llm_call", model=MODEL):
+        return replay.call("openai", key, lambda: get_breaker("openai").call(fetch))
+
+def build_portfolio_with_gpt(persona, stock_signals, use_cache=True, rate_limiter=None, top_n=None,
+                             allocation=None):
     """
     Build tightly structured, industry-aware recommendations.
     Each asset includes one concise 'Industry relevance' line (<= 20 words)
     referencing a product/service/market role that ties to the selected industries.
+    Identical (normalized) requests are answered from the response cache.
+    If a RateLimiter is given, API calls (not cache hits) wait for its budget.
+    Only the top_n pre-ranked candidates (default PRERANK_TOP_N) reach the prompt.
+    With an `allocation` (optimizer.allocate()), only its holdings are sent and
+    the model explains the given weights instead of choosing assets.
     """
     try:
-        persona_name = persona.get("name", "Investor")
-        persona_goals = persona.get("goal", "grow wealth")
-        scenario = persona.get("scenario", "balanced long-term growth")
-        risk = persona.get("risk_tolerance", persona.get("risk", "moderate"))
-        holding = persona.get("holding_period", "5+ years")
-        industries = persona.get("preferred_industries", [])
-        industries_str = ", ".join(industries) if industries else "no specific industries selected"
+        if allocation is not None:
+            stock_signals = _holdings(stock_signals, allocation)
+        else:
+            stock_signals = _prerank(persona, stock_signals, top_n)
 
         # Prepare ticker -> company name mapping for nicer bullets
         tickers = list(stock_signals.keys())
         company_names = _resolve_company_names(tickers)
 
-        # Build compact stock descriptions with numbers for the model
-        # Example: "AAPL (Apple Inc.): expected_return=3.2%, sentiment=78%"
-        stock_rows = []
-        for t, info in stock_signals.items():
-            try:
-                exp_ret = float(info["return"]) * 100.0
-            except Exception:
-                exp_ret = 0.0
-            try:
-                sent = float(info["sentiment"]) * 100.0
-            except Exception:
-                sent = 50.0
-            stock_rows.append(f"{t} ({company_names.get(t, t)}): expected_return={exp_ret:.1f}%, sentiment={sent:.0f}%")
+        key = _cache_key(persona, stock_signals, allocation) if use_cache else None
+        if key:
+            cached = _cached_response(key)
+            if cached is not None:
+                return cached
 
-        stock_block = "\n".join(stock_rows)
-
-        # Prompt: short, numeric, and industry-tied relevance
-        prompt = (
-            "You are a financial assistant helping a beginner investor.\n\n"
-            f"Investor: {persona_name}\n"
-            f"Scenario: {scenario}\n"
-            f"Goal: {persona_goals}\n"
-            f"Risk tolerance: {risk}\n"
-            f"Holding period: {holding}\n"
-            f"Preferred industries: {industries_str}\n\n"
-            f"Available stocks and funds (all have positive recent returns) with predicted returns and sentiment scores:\n"
-            f"{stock_block}\n\n"
-            "Task: Recommend a 3–4 asset portfolio tailored to this investor and industries. "
-            "Be concise, numerically grounded, and beginner-friendly.\n\n"
-            "For EACH recommended asset, output exactly this Markdown shape:\n"
-            "- TICKER – Company Name\n"
-            "  Industry relevance: <max 20 words tying the company to the selected industry via a product/service/market role>\n"
-            "  Rationale: 2–3 sentences; include expected_return (%) and sentiment (%) from above; keep it plain-English.\n"
-            "  Pros: <1–2 short pros>\n"
-            "  Cons: <1–2 short cons>\n"
-            "  Recent performance: brief 1-year or 5-year context if useful (concise)\n\n"
-            "Constraints:\n"
-            "- Use the candidate list above; prioritize those aligned with the selected industries.\n"
-            "- Keep each 'Industry relevance' to 20 words or fewer—specific and concrete (e.g., flagship product, dominant segment, ETF coverage of sector).\n"
-            "- Keep paragraphs short and readable; avoid long blocks of text.\n"
-            "- End with one sentence reminding the user that final decisions are theirs."
-        )
+        prompt = _build_prompt(persona, stock_signals, company_names, allocation)
+        if rate_limiter is not None:
+            rate_limiter.acquire(_estimate_tokens(prompt))
 
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",   # low-cost model per your constraint
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.5,         # slightly lower for tighter, more factual outputs
-        )
+        content = _complete(prompt)
+        if key:
+            _response_cache.put(key, content)
+        return content
 
-        return response.choices[0].message.content.strip()
+    except Exception as e:
+        print(f"GPT error: {e}")
+        metrics.incr("fallbacks", stage="llm")
+        return FALLBACK_MESSAGE
+
+def _split_blocks(text):
+    return [c.strip() for c in text.strip().split("\n\n") if c.strip()]
+
+def stream_portfolio_with_gpt(persona, stock_signals, use_cache=True, rate_limiter=None, top_n=None,
+                              allocation=None, status=None):
+    """
+    Streaming variant of build_portfolio_with_gpt(). Yields one blank-line
+    separated block (one asset, or the closing sentence) at a time, as soon as
+    the model has finished writing it. Cached responses are replayed as blocks,
+    and a completed stream is stored in the same response cache.
+    Errors are not raised: the stream just ends (with FALLBACK_MESSAGE if
+    nothing was yielded). Pass a dict as `status` to learn whether the response
+    was complete: status["complete"] is True only once the whole response was
+    yielded, so callers can avoid memoizing a truncated one.
+    """
+    status = {} if status is None else status
+    status["complete"] = False
+    yielded = 0
+    try:
+        if allocation is not None:
+            stock_signals = _holdings(stock_signals, allocation)
+        else:
+            stock_signals = _prerank(persona, stock_signals, top_n)
+        tickers = list(stock_signals.keys())
+        company_names = _resolve_company_names(tickers)
+
+        key = _cache_key(persona, stock_signals, allocation) if use_cache else None
+        if key:
+            cached = _cached_response(key)
+            if cached is not None:
+                yield from _split_blocks(cached)
+                status["complete"] = True
+                return
+
+        prompt = _build_prompt(persona, stock_signals, company_names, allocation)
+        if rate_limiter is not None:
+            rate_limiter.acquire(_estimate_tokens(prompt))
+
+        if replay.mode() != "off":
+            # Fixtures hold whole completions; replay them block by block
+            content = _complete(prompt)
+            if key:
+                _response_cache.put(key, content)
+            for block in _split_blocks(content):
+                yielded += 1
+                yield block
+            status["complete"] = True
+            return
+
+        with metrics.span("gpt_utils.llm_stream", model=MODEL), get_breaker("openai").guard():
+            metrics.incr("llm_calls", model=MODEL)
+            stream = get_client().chat.completions.create(
+                model=MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=TEMPERATURE,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+
+            parts = []
+            buffer = ""
+            finish_reason = None
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    _record_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                finish_reason = getattr(chunk.choices[0], "finish_reason", None) or finish_reason
+                delta = chunk.choices[0].delta.content or ""
+                parts.append(delta)
+                buffer += delta
+                # Emit every block that is already terminated by a blank line
+                while "\n\n" in buffer:
+                    block, buffer = buffer.split("\n\n", 1)
+                    if block.strip():
+                        yielded += 1
+                        yield block.strip()
+            if buffer.strip():
+                yielded += 1
+                yield buffer.strip()
+
+        if finish_reason != "stop":
+            # Cut off (length limit, dropped connection): usable now, but not worth keeping
+            print(f"[gpt_utils] Stream ended early (finish_reason={finish_reason})")
+            metrics.incr("fallbacks", stage="llm_truncated")
+            return
+        if key:
+            _response_cache.put(key, "".join(parts).strip())
+        status["complete"] = True
 
     except Exception as e:
         print(f"GPT error: {e}")
-        return "Fallback: Could not generate portfolio explanation."
+        metrics.incr("fallbacks", stage="llm")
+        if not yielded:
+            yield FALLBACK_MESSAGE
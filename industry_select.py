@@ -1,7 +1,18 @@
 # industry_select.py
+import os
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List, Dict
-from yahooquery import Screener
+
+import numpy as np
+
+import metrics
+import replay
+from circuit_breaker import get_breaker
+from symbol_index import get_symbol_index
+from ttl_cache import TTLCache
 
 # Fallback curated tickers per industry (used only if live fetch fails)
 FALLBACK_TICKERS: Dict[str, List[str]] = {
@@ -31,10 +42,210 @@ SCREENER_KEYS = {
     "Telecommunications": "all_telecom",
 }
 
-def fetch_live_tickers_for_industry(industry: str, count: int = 8) -> List[str]:
+# Raw screener quotes are cached per screener key, so different count/filter
+# settings reuse one download. Persisted to disk so a restarted app starts warm.
+# 250 is the largest page Yahoo's predefined screener endpoint returns.
+SCREENER_FETCH_COUNT = 250
+SCREENER_CACHE_TTL = int(os.getenv("SCREENER_CACHE_TTL", 6 * 60 * 60))
+SCREENER_CACHE_SIZE = int(os.getenv("SCREENER_CACHE_SIZE", 32))
+SCREENER_CACHE_PATH = os.getenv("SCREENER_CACHE_PATH", os.path.join(".cache", "screener.json"))
+
+_screener_cache = TTLCache(
+    max_entries=SCREENER_CACHE_SIZE,
+    ttl_seconds=SCREENER_CACHE_TTL,
+    path=SCREENER_CACHE_PATH,
+)
+
+# Default quality thresholds; callers can tune them per request without refetching
+MIN_MARKET_CAP = 3_000_000_000
+MIN_AVG_VOLUME = 300_000
+
+# Background refresh period for start_universe_refresher() (0 disables it)
+UNIVERSE_REFRESH_SECONDS = int(os.getenv("UNIVERSE_REFRESH_SECONDS", 60 * 60))
+
+# Screener fetches for several industries run concurrently on a shared, bounded pool.
+# Industries that miss the timeout use their curated fallback list instead.
+FANOUT_WORKERS = int(os.getenv("SCREENER_FANOUT_WORKERS", 4))
+FANOUT_TIMEOUT = float(os.getenv("SCREENER_FANOUT_TIMEOUT", 8.0))
+
+_fetch_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="screener")
+# Background universe refreshes get their own worker, so they never queue ahead of request fetches
+_refresh_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="universe-refresh")
+
+def _fetch_screener_quotes(screener_key: str) -> List[dict]:
+    from yahooquery import Screener  # deferred: heavy import, only needed on a cache miss
+
+    s = Screener()
+    # Ask for up to SCREENER_FETCH_COUNT symbols; we'll filter/sort locally
+    data = s.get_screeners([screener_key], count=SCREENER_FETCH_COUNT)
+    return (data or {}).get(screener_key, {}).get("quotes", [])
+
+def get_screener_quotes(screener_key: str, refresh: bool = False) -> List[dict]:
+    """
+    Raw quotes for a Yahoo screener collection, served from the cache when fresh
+    (refresh=True forces a new download).
+    Raises if the live fetch fails or returns nothing (nothing is cached then).
+    Fresh downloads also fill the local symbol metadata index.
+    """
+    quotes = None if refresh else _screener_cache.get(screener_key)
+    if quotes is not None:
+        metrics.incr("cache_hits", cache="screener")
+        return quotes
+    metrics.incr("cache_misses", cache="screener")
+
+    with metrics.span("industry_select.screener_fetch", key=screener_key):
+        quotes = replay.call(
+            "screener", {"key": screener_key, "count": SCREENER_FETCH_COUNT},
+            lambda: get_breaker("yahoo").call(lambda: _fetch_screener_quotes(screener_key)),
+        )
+    if not quotes:
+        raise ValueError("No quotes returned")
+
+    _screener_cache.put(screener_key, quotes)
+
+    industry = next((ind for ind, key in SCREENER_KEYS.items() if key == screener_key), None)
+    try:
+        get_symbol_index().update_from_quotes(quotes, sector=industry)
+    except Exception as e:
+        print(f"[industry_select] Could not index symbols for {screener_key}: {e}")
+    return quotes
+
+class UniverseTable:
+    """
+    Column-oriented view of screener quotes: parallel NumPy arrays for symbol,
+    industry, market, market cap and average volume. Filtering and sampling are
+    mask operations, so thresholds can change per request without refetching.
+    Unknown caps/volumes are stored as 0 and, as before, pass the size filters.
+    """
+
+    def __init__(self, symbol, industry, market, market_cap, avg_volume):
+        self.symbol = np.asarray(symbol, dtype=object)
+        self.industry = np.asarray(industry, dtype=object)
+        self.market = np.asarray(market, dtype=object)
+        self.market_cap = np.asarray(market_cap, dtype=float)
+        self.avg_volume = np.asarray(avg_volume, dtype=float)
+        self.is_us = np.array(["us" in m.lower() for m in self.market], dtype=bool)
+
+    def __len__(self):
+        return len(self.symbol)
+
+    @classmethod
+    def from_quotes(cls, quotes: List[dict], industry: str) -> "UniverseTable":
+        rows = [q for q in quotes if q.get("symbol")]
+        return cls(
+            symbol=[q["symbol"] for q in rows],
+            industry=[industry] * len(rows),
+            market=[q.get("market") or "" for q in rows],
+            market_cap=[q.get("marketCap") or q.get("market_cap") or 0 for q in rows],
+            avg_volume=[q.get("averageDailyVolume3Month") or q.get("average_daily_volume_3month") or 0 for q in rows],
+        )
+
+    @classmethod
+    def concat(cls, tables: List["UniverseTable"]) -> "UniverseTable":
+        if not tables:
+            return cls([], [], [], [], [])
+        return cls(
+            symbol=np.concatenate([t.symbol for t in tables]),
+            industry=np.concatenate([t.industry for t in tables]),
+            market=np.concatenate([t.market for t in tables]),
+            market_cap=np.concatenate([t.market_cap for t in tables]),
+            avg_volume=np.concatenate([t.avg_volume for t in tables]),
+        )
+
+    def mask(self, industries: List[str] = None, us_only: bool = True,
+             min_market_cap: float = MIN_MARKET_CAP, min_avg_volume: float = MIN_AVG_VOLUME) -> np.ndarray:
+        keep = np.ones(len(self), dtype=bool)
+        if industries:
+            keep &= np.isin(self.industry, list(industries))
+        if us_only:
+            keep &= self.is_us
+        if min_market_cap:
+            keep &= (self.market_cap == 0) | (self.market_cap >= min_market_cap)
+        if min_avg_volume:
+            keep &= (self.avg_volume == 0) | (self.avg_volume >= min_avg_volume)
+        return keep
+
+    def sample(self, count: int, **filters) -> List[str]:
+        """Up to `count` distinct symbols drawn at random from the rows passing the filters."""
+        candidates = np.flatnonzero(self.mask(**filters))
+        _, first = np.unique(self.symbol[candidates], return_index=True)  # dedup symbols
+        candidates = candidates[first]
+        rng = np.random.default_rng(random.getrandbits(64))  # follows random.seed() for reproducibility
+        picked = rng.permutation(candidates)[:count]
+        return self.symbol[picked].tolist()
+
+# Columnar tables per screener key, rebuilt only when the cached quotes change
+_industry_tables: Dict[str, tuple] = {}
+_tables_lock = threading.Lock()
+
+def get_industry_table(industry: str, refresh: bool = False) -> UniverseTable:
+    """UniverseTable for one industry, built from its (cached) screener quotes."""
+    screener_key = SCREENER_KEYS[industry]
+    quotes = get_screener_quotes(screener_key, refresh=refresh)
+    with _tables_lock:
+        cached = _industry_tables.get(screener_key)
+        if cached is not None and cached[0] is quotes:
+            return cached[1]
+    table = UniverseTable.from_quotes(quotes, industry)
+    with _tables_lock:
+        _industry_tables[screener_key] = (quotes, table)
+    return table
+
+def get_universe(industries: List[str] = None, refresh: bool = False,
+                 timeout: float = FANOUT_TIMEOUT, pool: ThreadPoolExecutor = _fetch_pool) -> UniverseTable:
+    """
+    Combined table over `industries` (default: all screener collections), fetched
+    concurrently under one shared deadline (`timeout`). Industries whose collection
+    cannot be fetched in time are left out; their fetch keeps running and warms
+    the screener cache. `pool` runs the fetches (the request-path pool by default).
+    """
+    targets = list(industries or SCREENER_KEYS.keys())
+    futures = {ind: pool.submit(metrics.bind(get_industry_table), ind, refresh) for ind in targets}
+    wait(futures.values(), timeout=timeout)
+    tables = []
+    for ind, fut in futures.items():
+        if fut.done() and fut.exception() is None:
+            tables.append(fut.result())
+        else:
+            error = fut.exception() if fut.done() else "timed out"
+            print(f"[industry_select] Universe refresh failed for {ind}: {error}")
+    return UniverseTable.concat(tables)
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def start_universe_refresher(interval_seconds: float = UNIVERSE_REFRESH_SECONDS):
+    """
+    Re-downloads every screener collection every `interval_seconds` on a daemon
+    thread, so live requests find a fresh screener cache. One thread per process
+    (later calls return it); None when the interval is 0.
+    """
+    global _refresher
+
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                # One collection at a time, off the request-path pool
+                get_universe(refresh=True, timeout=None, pool=_refresh_pool)
+            except Exception as e:
+                print(f"[industry_select] Universe refresh failed: {e}")
+
+    if interval_seconds <= 0:
+        return None
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=run, name="universe-refresh", daemon=True)
+            _refresher.start()
+        return _refresher
+
+def fetch_live_tickers_for_industry(industry: str, count: int = 8,
+                                    min_market_cap: float = MIN_MARKET_CAP,
+                                    min_avg_volume: float = MIN_AVG_VOLUME) -> List[str]:
     """
     Fetch tickers for an industry using Yahoo's public screener via yahooquery.
-    Applies basic quality filters and samples diverse names.
+    Applies basic quality filters (US market, market cap, average volume) as
+    vectorized masks over the industry's UniverseTable and samples diverse names.
     Falls back to curated list if needed.
     """
     screener_key = SCREENER_KEYS.get(industry)
@@ -43,64 +254,59 @@ def fetch_live_tickers_for_industry(industry: str, count: int = 8) -> List[str]:
         return random.sample(FALLBACK_TICKERS.get(industry, []), min(count, len(FALLBACK_TICKERS.get(industry, []))))
 
     try:
-        s = Screener()
-        # Ask for up to ~200 symbols; we'll filter/sort locally
-        data = s.get_screeners([screener_key], count=200)
-        quotes = (data or {}).get(screener_key, {}).get("quotes", [])
-        if not quotes:
-            raise ValueError("No quotes returned")
-
-        # Filter to US and reasonable liquidity/size
-        filtered = []
-        for q in quotes:
-            symbol = q.get("symbol")
-            market = q.get("market", "")
-            cap = q.get("marketCap") or q.get("market_cap") or 0
-            vol = q.get("averageDailyVolume3Month") or q.get("average_daily_volume_3month") or 0
-
-            # Basic filters: US market, market cap >= $3B, avg vol >= 300k
-            if not symbol:
-                continue
-            if not market or "us" not in market.lower():
-                continue
-            if cap and cap < 3_000_000_000:
-                continue
-            if vol and vol < 300_000:
-                continue
-
-            filtered.append(symbol)
-
-        # Dedup + randomize for diversity
-        filtered = list(dict.fromkeys(filtered))  # order-preserve dedup
-        random.shuffle(filtered)
-
-        # Sample requested count (or fewer if not enough)
-        if not filtered:
+        table = get_industry_table(industry)
+        picked = table.sample(count, min_market_cap=min_market_cap, min_avg_volume=min_avg_volume)
+
+        if not picked:
             raise ValueError("Filtered list empty")
 
-        return filtered[:count]
+        return picked
 
     except Exception as e:
         print(f"[industry_select] Live fetch failed for {industry}: {e}. Using fallback.")
+        metrics.incr("fallbacks", stage="screener")
         # Fallback curated sampling
         fallback = FALLBACK_TICKERS.get(industry, [])
-        random.shuffle(fallback)
-        return fallback[:count]
+        # sample() rather than shuffle() so concurrent callers never mutate the shared list
+        return random.sample(fallback, len(fallback))[:count]
 
-def fetch_tickers_by_industries(industries: List[str], per_industry: int = 5, max_total: int = 15) -> List[str]:
+def _fetch_industries_concurrently(industries: List[str], count: int, timeout: float) -> Dict[str, List[str]]:
+    """
+    Runs fetch_live_tickers_for_industry() for each industry on the shared pool.
+    All fetches share one deadline, so latency tracks the slowest industry rather
+    than the sum. Industries still running at the deadline get their curated
+    fallback; their fetch keeps running and warms the screener cache.
+    """
+    futures = {ind: _fetch_pool.submit(metrics.bind(fetch_live_tickers_for_industry), ind, count)
+               for ind in industries}
+    wait(futures.values(), timeout=timeout)
+
+    results: Dict[str, List[str]] = {}
+    for ind, fut in futures.items():
+        if fut.done() and fut.exception() is None:
+            results[ind] = fut.result()
+        else:
+            print(f"[industry_select] Live fetch timed out for {ind}. Using fallback.")
+            metrics.incr("fallbacks", stage="screener_timeout")
+            fallback = FALLBACK_TICKERS.get(ind, [])
+            results[ind] = random.sample(fallback, len(fallback))[:count]
+    return results
+
+def fetch_tickers_by_industries(industries: List[str], per_industry: int = 5, max_total: int = 15,
+                                timeout: float = FANOUT_TIMEOUT) -> List[str]:
     """
     Aggregate tickers across selected industries with live fetch + filtering.
+    Industries are fetched concurrently under one shared timeout.
     Ensures diversity and caps total length.
     """
-    all_syms: List[str] = []
-    for ind in industries or []:
-        syms = fetch_live_tickers_for_industry(ind, count=per_industry)
-        all_syms.extend(syms)
-
     # If user chose no industry, diversify with a few across all categories
-    if not industries:
-        for ind in list(SCREENER_KEYS.keys())[:3]:  # grab a few categories to keep it short
-            all_syms.extend(fetch_live_tickers_for_industry(ind, count=per_industry))
+    targets = list(industries or []) or list(SCREENER_KEYS.keys())[:3]  # a few categories to keep it short
+
+    with metrics.span("industry_select.fetch_tickers_by_industries", industries=len(targets)):
+        per_industry_syms = _fetch_industries_concurrently(targets, per_industry, timeout)
+    all_syms: List[str] = []
+    for ind in targets:
+        all_syms.extend(per_industry_syms[ind])
 
     # Dedup while preserving order, cap total
     seen = set()
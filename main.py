@@ -2,31 +2,163 @@
 main.py
 
 Entry point to generate a personalized portfolio report for a selected investor persona.
-Fetches static stock signals, invokes GPT for explanation, and saves the result to /reports.
+Fetches live stock signals, invokes GPT for explanation, and saves the result to /reports.
 Usage: python3 main.py [persona_key]
+
+Batch mode generates a report for every persona in get_personas(). Signals are
+fetched once and shared, and the GPT calls run concurrently under a concurrency
+limit and an RPM/TPM rate limiter:
+    python3 main.py --all [--concurrency 3] [--rpm 60] [--tpm 40000]
+
+Bulk mode generates reports for customer profiles from a CSV/JSONL file;
+profiles with the same normalized inputs share one LLM call, and an interrupted
+run resumes from its checkpoint (see bulk_profiles.py):
+    python3 main.py --profiles customers.csv [--output bulk_reports] [--concurrency 4]
+
+Holdings and weights are computed locally by the mean-variance optimizer
+(optimizer.py) and GPT only explains them; --no-optimize lets GPT pick instead.
+
+Upstream calls can be recorded and replayed offline (see replay.py):
+    python3 main.py --all --replay record
+    python3 main.py --all --replay replay --replay-latency-ms recorded
+
+Per-stage timings and counters (see metrics.py) can be exported after the run:
+    python3 main.py --all --metrics-out metrics.prom   # Prometheus text format
+    python3 main.py --all --metrics-out metrics.jsonl  # appends a JSON snapshot
 """
 
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from personas import get_personas
-from data_fetch import get_live_signals
-from gpt_utils import build_portfolio_with_gpt
+from data_fetch import get_live_signals, get_price_history
+from gpt_utils import build_portfolio_with_gpt, FALLBACK_MESSAGE
+import metrics
+import optimizer
+import replay
+from rate_limiter import RateLimiter
 from report_generator import save_markdown_report
 
-# Step 1: Define the tickers you want to test (stock + ETF)
-tickers = ["AAPL", "TSLA", "GOOG", "SPY", "VOO"]
+# Tickers you want to test (stock + ETF)
+DEFAULT_TICKERS = ["AAPL", "TSLA", "GOOG", "SPY", "VOO"]
+
+
+def run_single(persona_key, tickers=DEFAULT_TICKERS, top_n=None, optimize=True):
+    # Get live/fallback signals from Yahoo Finance
+    stock_signals = get_live_signals(tickers)
+
+    # Load beginner-friendly persona
+    persona = get_personas()[persona_key]
+
+    # Compute the allocation locally (None -> GPT picks the assets)
+    allocation = optimizer.allocate_for_persona(persona, stock_signals) if optimize else None
+
+    # Generate GPT response using gpt-3.5-turbo
+    report = build_portfolio_with_gpt(persona, stock_signals, top_n=top_n, allocation=allocation)
+
+    # Save output to a Markdown report (a fallback would overwrite the last good report)
+    if report != FALLBACK_MESSAGE:
+        save_markdown_report(persona_key, report,
+                             inputs={"persona": persona, "signals": stock_signals, "allocation": allocation})
+
+    # Print the Markdown to console for review
+    print("\n===== GPT Portfolio Report =====\n")
+    print(report)
+
+
+def run_batch(persona_keys=None, tickers=DEFAULT_TICKERS, concurrency=3,
+              requests_per_minute=None, tokens_per_minute=None, top_n=None, optimize=True):
+    """
+    Generates one report per persona. Signals are fetched once and shared;
+    GPT calls run on a bounded pool and respect the RPM/TPM budgets.
+    Returns {persona_key: {"seconds": float, "ok": bool}}.
+    """
+    personas = get_personas()
+    persona_keys = persona_keys or list(personas.keys())
+
+    stock_signals = get_live_signals(tickers)
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    # Sync and load the candidates' price history once; every persona's optimizer run reads it
+    prices = get_price_history(list(stock_signals), optimizer.OPTIMIZER_LOOKBACK) if optimize else None
+
+    def generate(persona_key):
+        start = time.perf_counter()
+        try:
+            persona = personas[persona_key]
+            allocation = optimizer.allocate_for_persona(persona, stock_signals, prices=prices) if optimize else None
+            report = build_portfolio_with_gpt(persona, stock_signals, rate_limiter=limiter,
+                                              top_n=top_n, allocation=allocation)
+            ok = report != FALLBACK_MESSAGE
+            if ok:
+                record = save_markdown_report(persona_key, report, inputs={
+                    "persona": persona, "signals": stock_signals, "allocation": allocation,
+                })
+                ok = record is not None
+        except Exception as e:
+            print(f"Batch error for {persona_key}: {e}")
+            ok = False
+        return persona_key, {"seconds": time.perf_counter() - start, "ok": ok}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        results = dict(pool.map(generate, persona_keys))
+
+    print_batch_summary(results)
+    return results
+
+
+def print_batch_summary(results):
+    print("\n===== Batch Summary =====\n")
+    for persona_key, r in results.items():
+        status = "ok" if r["ok"] else "FAILED"
+        print(f"{persona_key:<28} {r['seconds']:7.2f}s  {status}")
+    failures = [k for k, r in results.items() if not r["ok"]]
+    print(f"\n{len(results) - len(failures)}/{len(results)} reports generated"
+          + (f"; failed: {', '.join(failures)}" if failures else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate persona portfolio reports.")
+    parser.add_argument("persona_key", nargs="?", default="college_student")
+    parser.add_argument("--all", action="store_true", help="generate reports for every persona")
+    parser.add_argument("--concurrency", type=int, default=3, help="max concurrent GPT calls in batch mode")
+    parser.add_argument("--rpm", type=float, default=None, help="GPT requests-per-minute budget")
+    parser.add_argument("--tpm", type=float, default=None, help="GPT tokens-per-minute budget")
+    parser.add_argument("--top-n", type=int, default=None,
+                        help="candidates kept by local pre-ranking for the prompt (0 = all; default PRERANK_TOP_N)")
+    parser.add_argument("--profiles", default=None, help="CSV/JSONL of customer profiles (bulk mode)")
+    parser.add_argument("--output", default="bulk_reports", help="bulk mode output and checkpoint directory")
+    parser.add_argument("--no-optimize", action="store_true",
+                        help="let GPT pick the assets instead of explaining the optimizer's allocation")
+    parser.add_argument("--replay", choices=replay.MODES, default=None,
+                        help="record upstream responses, or replay them offline (overrides REPLAY_MODE)")
+    parser.add_argument("--replay-latency-ms", default=None,
+                        help="simulated replay latency: ms, 'recorded', or 'yahoo=100,openai=1500'")
+    parser.add_argument("--metrics-out", default=None,
+                        help="export metrics after the run (.prom = Prometheus text, otherwise JSON lines)")
+    args = parser.parse_args(argv)
+
+    if args.replay or args.replay_latency_ms is not None:
+        replay.set_mode(args.replay or replay.mode(), latency_ms=args.replay_latency_ms)
 
-# Step 2: Get live/fallback signals from Yahoo Finance
-stock_signals = get_live_signals(tickers)
+    if args.profiles:
+        from bulk_profiles import run_bulk
 
-# Step 3: Load beginner-friendly persona
-personas = get_personas()
-persona = personas["college_student"]
+        run_bulk(args.profiles, args.output, concurrency=args.concurrency, requests_per_minute=args.rpm,
+                 tokens_per_minute=args.tpm, optimize=not args.no_optimize)
+    elif args.all:
+        run_batch(concurrency=args.concurrency, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                  top_n=args.top_n, optimize=not args.no_optimize)
+    else:
+        run_single(args.persona_key, top_n=args.top_n, optimize=not args.no_optimize)
 
-# Step 4: Generate GPT response using gpt-3.5-turbo
-report = build_portfolio_with_gpt(persona, stock_signals)
+    if args.metrics_out:
+        if args.metrics_out.endswith(".prom"):
+            metrics.export_prometheus(args.metrics_out)
+        else:
+            metrics.export_json(args.metrics_out)
+        print(f"Metrics written to {args.metrics_out}")
 
-# Step 5: Save output to a Markdown report
-save_markdown_report("college_student", report)
 
-# Step 6: Print the Markdown to console for review
-print("\n===== GPT Portfolio Report =====\n")
-print(report)
+if __name__ == "__main__":
+    main()
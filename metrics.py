@@ -0,0 +1,191 @@
+"""
+metrics.py
+
+Lightweight, dependency-free instrumentation for the pipeline: timed spans,
+counters, and a per-request trace that records the timing breakdown of one
+results computation (screener fetches, price downloads, name lookups, the
+OpenAI call, report saving).
+
+Process-wide aggregates can be exported as a JSON snapshot or in Prometheus
+text format; the Streamlit app can show the current request's trace.
+
+Key functions:
+- span(name, **labels): Context manager timing a block (aggregated + added to the active trace).
+- incr(name, value=1, **labels): Increments a counter (cache hits, fallbacks, tokens, retries...).
+- trace(): Context manager collecting the spans of one request; yields a Trace.
+- bind(fn): Wraps fn so it runs inside the caller's trace when submitted to a thread pool.
+- snapshot() / export_json(path) / export_prometheus(path): Export the aggregates.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_timers = {}    # (name, labels) -> {"count", "sum", "max"} in seconds
+_active_trace = contextvars.ContextVar("metrics_active_trace", default=None)
+_depth = contextvars.ContextVar("metrics_span_depth", default=0)
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Trace:
+    """Spans recorded for one request, in start order."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def rows(self):
+        """Spans as display-friendly dicts (indented by nesting depth)."""
+        return [
+            {
+                "span": "  " * s["depth"] + s["name"],
+                "start_ms": round(s["start_ms"], 1),
+                "duration_ms": round(s["duration_ms"], 1),
+                **s["labels"],
+            }
+            for s in sorted(self.spans, key=lambda s: s["start_ms"])
+        ]
+
+    def counter_rows(self):
+        return [
+            {"counter": name, "labels": ", ".join(f"{k}={v}" for k, v in labels), "value": value}
+            for (name, labels), value in sorted(self.counters.items())
+        ]
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times the block. Aggregates are keyed by name only (labels can be high
+    cardinality, e.g. symbol counts); labels are kept on the trace entry.
+    """
+    trace_ = _active_trace.get()
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _depth.reset(token)
+        with _lock:
+            t = _timers.setdefault(_key(name, {}), {"count": 0, "sum": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["sum"] += elapsed
+            t["max"] = max(t["max"], elapsed)
+        if trace_ is not None:
+            with trace_._lock:
+                trace_.spans.append({
+                    "name": name,
+                    "labels": labels,
+                    "depth": depth,
+                    "start_ms": (start - trace_.started) * 1000.0,
+                    "duration_ms": elapsed * 1000.0,
+                })
+
+
+def incr(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    trace_ = _active_trace.get()
+    if trace_ is not None:
+        with trace_._lock:
+            trace_.counters[key] = trace_.counters.get(key, 0) + value
+
+
+@contextmanager
+def trace():
+    """Collects spans/counters of everything run inside the block (and bind()-ed workers)."""
+    trace_ = Trace()
+    token = _active_trace.set(trace_)
+    try:
+        yield trace_
+    finally:
+        _active_trace.reset(token)
+
+
+def bind(fn):
+    """Returns fn bound to a copy of the current context (so worker threads join the active trace)."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+def snapshot():
+    """Process-wide counters and timer aggregates as JSON-friendly dicts."""
+    with _lock:
+        counters = [
+            {"name": name, "labels": dict(labels), "value": value}
+            for (name, labels), value in sorted(_counters.items())
+        ]
+        timers = [
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": t["count"],
+                "sum_ms": round(t["sum"] * 1000.0, 3),
+                "avg_ms": round(t["sum"] * 1000.0 / t["count"], 3) if t["count"] else 0.0,
+                "max_ms": round(t["max"] * 1000.0, 3),
+            }
+            for (name, labels), t in sorted(_timers.items())
+        ]
+    return {"timestamp": time.time(), "counters": counters, "timers": timers}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+
+def export_json(path):
+    """Appends one snapshot as a JSON line to `path`."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(snapshot()) + "\n")
+
+
+def _prom_name(name):
+    return "investment_analyst_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _prom_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+def export_prometheus(path):
+    """Writes the aggregates in Prometheus text exposition format (for a textfile collector)."""
+    lines = []
+    with _lock:
+        for (name, labels), value in sorted(_counters.items()):
+            lines.append(f"{_prom_name(name)}_total{_prom_labels(labels)} {value}")
+        for (name, labels), t in sorted(_timers.items()):
+            base = _prom_name(name) + "_seconds"
+            lines.append(f"{base}_count{_prom_labels(labels)} {t['count']}")
+            lines.append(f"{base}_sum{_prom_labels(labels)} {t['sum']:.6f}")
+            lines.append(f"{base}_max{_prom_labels(labels)} {t['max']:.6f}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
@@ -0,0 +1,176 @@
+"""
+optimizer.py
+
+Local mean-variance portfolio construction, so the allocation is computed
+(deterministically, with weights) before the LLM is asked to explain it.
+
+- Covariance of daily log returns, shrunk toward a constant-variance target
+  with the Ledoit-Wolf intensity (stable even with more candidates than days).
+- Expected returns: historical mean log return, shrunk halfway toward the
+  cross-sectional mean, plus a small tilt from the sentiment signal.
+- Weights maximize  w'mu - (risk_aversion / 2) w'Sigma w  subject to
+  sum(w) = 1 and 0 <= w <= max_weight, solved by projected gradient descent.
+  The best `n_assets` names are then re-optimized on their own, so the result
+  is a 3-4 asset portfolio like the ones the prompt used to ask for; an
+  allocation with fewer than MIN_HOLDINGS names is rejected.
+
+Risk aversion and the weight cap depend on the persona's risk level (the
+app's RISK_OPTIONS, "very low" through "high").
+
+Key functions:
+- shrunk_covariance(log_returns): Ledoit-Wolf shrinkage covariance (annualized).
+- optimize_weights(mu, cov, risk): Constrained mean-variance weights.
+- allocate(tickers, risk, ...): Allocation for tickers from stored prices.
+- allocate_for_persona(persona, stock_signals): The same, for a persona; None if it cannot be computed.
+"""
+
+import os
+import warnings
+from typing import Dict, List
+
+import numpy as np
+
+import metrics
+
+TRADING_DAYS_PER_YEAR = 252
+
+# Per risk level: risk aversion (higher = lower volatility) and max weight per asset
+RISK_PROFILES = {
+    "very low": {"risk_aversion": 20.0, "max_weight": 0.40},
+    "low":      {"risk_aversion": 10.0, "max_weight": 0.45},
+    "moderate": {"risk_aversion": 5.0, "max_weight": 0.50},
+    "high":     {"risk_aversion": 2.0, "max_weight": 0.60},
+}
+
+PORTFOLIO_ASSETS = int(os.getenv("PORTFOLIO_ASSETS", 4))
+OPTIMIZER_LOOKBACK = os.getenv("OPTIMIZER_LOOKBACK", "1y")
+MIN_HISTORY_DAYS = 40
+# Fewer holdings than this is not a portfolio; callers fall back to the LLM's pick
+MIN_HOLDINGS = 3
+MEAN_SHRINKAGE = 0.5
+SENTIMENT_TILT = 0.05  # annual return added per unit of (sentiment - 0.5)
+
+
+def shrunk_covariance(log_returns: np.ndarray) -> np.ndarray:
+    """
+    Annualized covariance of a (days x assets) matrix of daily log returns
+    (NaN = no data), shrunk toward mean-variance * I with the Ledoit-Wolf intensity.
+    """
+    observed = ~np.isnan(log_returns)
+    n_days = log_returns.shape[0]
+    # Missing days count as an average day; each asset is then rescaled to the
+    # variance over its own observations (D S D keeps the matrix PSD)
+    x = np.where(observed, log_returns - np.nanmean(log_returns, axis=0), 0.0)
+    scale = np.sqrt(n_days / np.maximum(observed.sum(axis=0), 1))
+    x = x * scale
+    sample = x.T @ x / n_days
+    n_assets = sample.shape[0]
+    target = np.trace(sample) / n_assets
+    # Ledoit & Wolf (2004): delta = min(1, pi / (n * ||S - F||^2))
+    distance = np.sum((sample - target * np.eye(n_assets)) ** 2)
+    pi = np.sum(np.sum(x ** 2, axis=1) ** 2) / n_days - np.sum(sample ** 2)
+    intensity = 1.0 if distance <= 0 else float(np.clip(pi / n_days / distance, 0.0, 1.0))
+    shrunk = intensity * target * np.eye(n_assets) + (1.0 - intensity) * sample
+    return shrunk * TRADING_DAYS_PER_YEAR
+
+
+def _project_capped_simplex(v: np.ndarray, cap: float) -> np.ndarray:
+    """Euclidean projection onto {w : 0 <= w <= cap, sum(w) = 1} (bisection on the shift)."""
+    lo, hi = v.min() - cap, v.max()
+    for _ in range(60):
+        tau = (lo + hi) / 2
+        if np.clip(v - tau, 0.0, cap).sum() > 1.0:
+            lo = tau
+        else:
+            hi = tau
+    return np.clip(v - hi, 0.0, cap)
+
+
+def optimize_weights(mu: np.ndarray, cov: np.ndarray, risk: str = "moderate",
+                     max_iter: int = 500, tol: float = 1e-9) -> np.ndarray:
+    """Long-only mean-variance weights for the persona's risk level (sum to 1)."""
+    profile = RISK_PROFILES.get(risk, RISK_PROFILES["moderate"])
+    n = len(mu)
+    # The cap cannot be below an equal split
+    cap = max(profile["max_weight"], 1.0 / n)
+    gamma = profile["risk_aversion"]
+    # Step 1/L, with L bounded by the max absolute row sum of the Hessian
+    step = 1.0 / max(gamma * np.abs(cov).sum(axis=1).max(), 1e-12)
+    w = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        grad = mu - gamma * (cov @ w)
+        nxt = _project_capped_simplex(w + step * grad, cap)
+        if np.abs(nxt - w).max() < tol:
+            w = nxt
+            break
+        w = nxt
+    return w
+
+
+def allocate(tickers: List[str], risk: str = "moderate", n_assets: int = PORTFOLIO_ASSETS,
+             prices=None, sentiment: Dict[str, float] = None, lookback: str = OPTIMIZER_LOOKBACK) -> dict:
+    """
+    Allocation over `tickers`: {"weights": {ticker: w}, "expected_return",
+    "volatility", "risk"}. Prices default to the local store (data_fetch).
+    Tickers with less than MIN_HISTORY_DAYS of prices are left out.
+    Raises ValueError if fewer than MIN_HOLDINGS tickers would be held.
+    """
+    if prices is None:
+        from data_fetch import get_price_history
+
+        prices = get_price_history(tickers, lookback)
+    prices = prices.reindex(columns=list(dict.fromkeys(tickers)))
+
+    with metrics.span("optimizer.allocate", candidates=len(tickers)):
+        matrix = prices.to_numpy(dtype=float)
+        enough = np.sum(~np.isnan(matrix), axis=0) >= MIN_HISTORY_DAYS
+        symbols = [t for t, ok in zip(prices.columns, enough) if ok]
+        if len(symbols) < MIN_HOLDINGS:
+            raise ValueError(f"Only {len(symbols)} candidates have enough price history to optimize")
+        with np.errstate(divide="ignore", invalid="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            log_returns = np.diff(np.log(matrix[:, enough]), axis=0)
+            mean = np.nanmean(log_returns, axis=0) * TRADING_DAYS_PER_YEAR
+        mu = (1 - MEAN_SHRINKAGE) * mean + MEAN_SHRINKAGE * mean.mean()
+        if sentiment:
+            mu = mu + SENTIMENT_TILT * (np.array([sentiment.get(t, 0.5) for t in symbols]) - 0.5)
+        cov = shrunk_covariance(log_returns)
+
+        weights = optimize_weights(mu, cov, risk)
+        if n_assets and len(symbols) > n_assets:
+            keep = np.sort(np.argsort(-weights, kind="stable")[:n_assets])
+            sub = np.ix_(keep, keep)
+            weights = np.zeros(len(symbols))
+            weights[keep] = optimize_weights(mu[keep], cov[sub], risk)
+
+        held = np.flatnonzero(weights > 1e-4)
+        if len(held) < MIN_HOLDINGS:
+            raise ValueError(f"Optimal allocation holds only {len(held)} assets")
+        w = weights[held] / weights[held].sum()
+        order = np.argsort(-w, kind="stable")
+        held, w = held[order], w[order]
+        return {
+            "weights": {symbols[i]: round(float(x), 4) for i, x in zip(held, w)},
+            "expected_return": float(w @ mu[held]),
+            "volatility": float(np.sqrt(w @ cov[np.ix_(held, held)] @ w)),
+            "risk": risk,
+        }
+
+
+def allocate_for_persona(persona: dict, stock_signals, n_assets: int = PORTFOLIO_ASSETS, prices=None) -> dict:
+    """
+    allocate() over the candidates in `stock_signals` at the persona's risk level.
+    `prices` (get_price_history() over OPTIMIZER_LOOKBACK) lets several personas
+    share one load. Returns None (callers let the LLM pick instead) if it cannot be computed.
+    """
+    tickers = list(stock_signals)
+    if len(tickers) < MIN_HOLDINGS:
+        return None
+    risk = persona.get("risk_tolerance", persona.get("risk", "moderate"))
+    try:
+        sentiment = {t: stock_signals[t].get("sentiment", 0.5) for t in tickers}
+        return allocate(tickers, risk, n_assets=n_assets, prices=prices, sentiment=sentiment)
+    except Exception as e:
+        print(f"[optimizer] Could not compute an allocation: {e}")
+        metrics.incr("fallbacks", stage="optimizer")
+        return None
@@ -8,7 +8,8 @@ Example personas include:
 - College Student (moderate risk, long-term growth)
 - High School Student (very low risk, learning-focused)
 
-Call get_personas() to retrieve all available personas as a dictionary.
+Call get_personas() to retrieve all available personas as a dictionary, and
+build_persona() for one persona with the wizard's answers applied.
 """
 
 def get_personas():
@@ -78,3 +79,18 @@ def get_personas():
             )
         }
     }
+
+
+def build_persona(persona_key, scenario=None, risk=None, holding=None, industries=None):
+    """Copy of a persona with the user's scenario, risk, holding period and industries applied."""
+    personas = get_personas()
+    if persona_key not in personas:
+        raise KeyError(persona_key)
+    persona = dict(personas[persona_key])
+    persona["scenario"] = scenario or "balanced long-term growth"
+    persona["risk_tolerance"] = risk or persona.get("risk", "moderate")
+    if holding:
+        persona["holding_period"] = holding
+    if industries:
+        persona["preferred_industries"] = list(industries)
+    return persona
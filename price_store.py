@@ -0,0 +1,157 @@
+"""
+price_store.py
+
+Local on-disk store of daily adjusted close prices, keyed by ticker and date.
+Backed by SQLite so it needs no extra dependencies and is safe to share between
+the Streamlit app and batch scripts.
+
+data_fetch uses the store to download only the bars missing since the last
+stored date, and to fall back on real last-known-good prices when Yahoo is
+unreachable.
+
+Key class:
+- PriceStore: upsert/load price frames and track when each ticker was last fetched.
+- get_price_store(): Returns the shared store for the configured path.
+"""
+
+import os
+import time
+from contextlib import closing
+from typing import Dict, List
+
+import pandas as pd
+
+from sqlite_store import SQLiteStore, StoreRegistry
+
+DEFAULT_DB_PATH = os.getenv("PRICE_STORE_PATH", os.path.join(".cache", "prices.sqlite"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL,
+    adj_close REAL NOT NULL,
+    PRIMARY KEY (ticker, date)
+);
+CREATE TABLE IF NOT EXISTS fetch_log (
+    ticker TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL,
+    requested_from TEXT
+);
+"""
+
+
+class PriceStore(SQLiteStore):
+    """Daily adjusted closes plus a per-ticker fetch log (see sqlite_store.SQLiteStore)."""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        super().__init__(path)
+
+    def _migrate(self, conn):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(fetch_log)")}
+        if "requested_from" not in columns:  # stores created before it was tracked
+            conn.execute("ALTER TABLE fetch_log ADD COLUMN requested_from TEXT")
+
+    def fetched_at(self, tickers: List[str]) -> Dict[str, float]:
+        """Unix timestamp of the last successful fetch per ticker."""
+        if not tickers:
+            return {}
+        marks = ",".join("?" * len(tickers))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT ticker, fetched_at FROM fetch_log WHERE ticker IN ({marks})", tickers
+            ).fetchall()
+        return dict(rows)
+
+    def requested_from(self, tickers: List[str]) -> Dict[str, str]:
+        """Earliest start date (ISO) ever requested from upstream per ticker."""
+        if not tickers:
+            return {}
+        marks = ",".join("?" * len(tickers))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT ticker, requested_from FROM fetch_log WHERE ticker IN ({marks}) "
+                "AND requested_from IS NOT NULL", tickers
+            ).fetchall()
+        return dict(rows)
+
+    def mark_fetched(self, tickers: List[str], when: float = None, requested_from: str = None):
+        """
+        Records a successful fetch. `requested_from` is the start date of a
+        full-window request; the earliest one is kept, so a ticker whose history
+        is shorter than the window is not re-downloaded in full every time.
+        """
+        when = time.time() if when is None else when
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO fetch_log (ticker, fetched_at, requested_from) VALUES (?, ?, ?) "
+                "ON CONFLICT(ticker) DO UPDATE SET fetched_at = excluded.fetched_at, "
+                "requested_from = CASE WHEN fetch_log.requested_from IS NULL "
+                "    OR excluded.requested_from < fetch_log.requested_from "
+                "    THEN COALESCE(excluded.requested_from, fetch_log.requested_from) "
+                "    ELSE fetch_log.requested_from END",
+                [(t, when, requested_from) for t in tickers],
+            )
+
+    def date_range(self, tickers: List[str]) -> Dict[str, tuple]:
+        """(first_date, last_date) ISO strings per stored ticker."""
+        if not tickers:
+            return {}
+        marks = ",".join("?" * len(tickers))
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT ticker, MIN(date), MAX(date) FROM prices WHERE ticker IN ({marks}) GROUP BY ticker",
+                tickers,
+            ).fetchall()
+        return {t: (first, last) for t, first, last in rows}
+
+    def upsert(self, prices: pd.DataFrame) -> int:
+        """
+        Writes a wide (date x ticker) price frame. Existing bars are replaced,
+        so re-fetching the latest (possibly partial) bar updates it in place.
+        """
+        if prices is None or prices.empty:
+            return 0
+        long = prices.stack().dropna()
+        rows = [
+            (str(ticker), pd.Timestamp(day).strftime("%Y-%m-%d"), float(value))
+            for (day, ticker), value in long.items()
+        ]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO prices (ticker, date, adj_close) VALUES (?, ?, ?)", rows
+            )
+        return len(rows)
+
+    def load_window(self, tickers: List[str], days: int) -> pd.DataFrame:
+        """
+        Wide (date x ticker) frame covering `days` calendar days up to each
+        ticker's latest stored bar. Anchoring on the latest bar means a store
+        that could not be refreshed still yields its last-known-good window.
+        """
+        if not tickers:
+            return pd.DataFrame()
+        marks = ",".join("?" * len(tickers))
+        query = (
+            "SELECT p.ticker, p.date, p.adj_close FROM prices p "
+            "JOIN (SELECT ticker, MAX(date) AS last FROM prices "
+            f"      WHERE ticker IN ({marks}) GROUP BY ticker) m ON p.ticker = m.ticker "
+            "WHERE p.date >= date(m.last, ?)"
+        )
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, [*tickers, f"-{int(days)} days"]).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        long = pd.DataFrame(rows, columns=["ticker", "date", "adj_close"])
+        wide = long.pivot(index="date", columns="ticker", values="adj_close").sort_index()
+        wide.index = pd.to_datetime(wide.index)
+        return wide
+
+
+_stores = StoreRegistry(PriceStore)
+
+
+def get_price_store(path: str = DEFAULT_DB_PATH) -> PriceStore:
+    """Shared PriceStore per path (schema setup runs once per process)."""
+    return _stores.get(path)
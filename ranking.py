@@ -0,0 +1,107 @@
+"""
+ranking.py
+
+Deterministic local pre-ranking of candidate tickers before the LLM call. Each
+candidate is scored from its signals against the persona's risk tolerance,
+holding period and preferred industries, and only the top N are sent to the
+model, which keeps the prompt (and its latency) flat as the candidate list grows.
+
+Signals are z-scored across the candidates, so the weights express relative
+preference within one request. Metrics that are absent (e.g. volatility when
+DETAILED_SIGNALS is off in data_fetch) contribute nothing.
+
+Key functions:
+- score_candidates(persona, stock_signals, sectors=None): ticker -> score.
+- rank_candidates(persona, stock_signals, top_n, sectors=None): Top-N signals, best first.
+"""
+
+import os
+import re
+from typing import Dict
+
+import numpy as np
+
+from signal_table import SignalTable
+
+# Candidates kept for the prompt (0 disables pre-ranking)
+PRERANK_TOP_N = int(os.getenv("PRERANK_TOP_N", 8))
+
+# Per-risk-level weights of each (z-scored) signal; negative weights penalize
+RISK_WEIGHTS = {
+    "very low": {"return": 0.5, "sentiment": 1.0, "volatility": -1.5, "max_drawdown": 1.0, "momentum": 0.25, "beta": -1.0},
+    "low":      {"return": 0.75, "sentiment": 1.0, "volatility": -1.0, "max_drawdown": 0.75, "momentum": 0.5, "beta": -0.5},
+    "moderate": {"return": 1.0, "sentiment": 0.75, "volatility": -0.5, "max_drawdown": 0.5, "momentum": 0.75, "beta": 0.0},
+    "high":     {"return": 1.5, "sentiment": 0.5, "volatility": 0.0, "max_drawdown": 0.0, "momentum": 1.0, "beta": 0.5},
+}
+
+# Multipliers per holding horizon: short horizons lean on recent returns,
+# long ones on trend and tolerate more short-term volatility
+HORIZON_MULTIPLIERS = {
+    "short":  {"return": 1.5, "momentum": 0.5},
+    "medium": {},
+    "long":   {"return": 0.75, "momentum": 1.25, "volatility": 0.75, "sentiment": 0.75},
+}
+
+# Added (in z-score units) to candidates in one of the persona's preferred industries
+INDUSTRY_BONUS = 1.0
+
+
+def _horizon(holding_period: str) -> str:
+    """'1-3 years' -> short, '4-7 years' / '5+ years' -> medium, '10+ years' -> long."""
+    years = [int(n) for n in re.findall(r"\d+", str(holding_period or ""))]
+    if not years:
+        return "medium"
+    if max(years) <= 3:
+        return "short"
+    if min(years) >= 10:
+        return "long"
+    return "medium"
+
+
+def _weights(persona: dict) -> Dict[str, float]:
+    risk = persona.get("risk_tolerance", persona.get("risk", "moderate"))
+    weights = dict(RISK_WEIGHTS.get(risk, RISK_WEIGHTS["moderate"]))
+    for metric, factor in HORIZON_MULTIPLIERS[_horizon(persona.get("holding_period"))].items():
+        weights[metric] = weights.get(metric, 0.0) * factor
+    return weights
+
+
+def score_candidates(persona: dict, stock_signals, sectors: Dict[str, str] = None) -> Dict[str, float]:
+    """
+    ticker -> preference score (higher is better). `sectors` maps tickers to an
+    industry name for the preferred-industry bonus.
+    """
+    table = SignalTable.from_signals(stock_signals)
+    tickers = table.symbols
+    if not tickers:
+        return {}
+    scores = np.zeros(len(tickers))
+    for metric, weight in _weights(persona).items():
+        if not weight:
+            continue
+        values = table.column(metric)
+        if np.isnan(values).all():
+            continue
+        std = np.nanstd(values)
+        z = (values - np.nanmean(values)) / std if std > 0 else np.zeros(len(values))
+        scores += weight * np.nan_to_num(z, nan=0.0)
+
+    preferred = set(persona.get("preferred_industries") or [])
+    if preferred and sectors:
+        scores += INDUSTRY_BONUS * np.array([sectors.get(t) in preferred for t in tickers], dtype=float)
+    return dict(zip(tickers, scores.tolist()))
+
+
+def rank_candidates(persona: dict, stock_signals, top_n: int = PRERANK_TOP_N,
+                    sectors: Dict[str, str] = None) -> SignalTable:
+    """
+    The `top_n` best-scoring rows of `stock_signals` (a SignalTable or dict),
+    best first (ties broken by ticker, so the result is deterministic).
+    top_n <= 0 keeps everything.
+    """
+    table = SignalTable.from_signals(stock_signals)
+    if top_n <= 0 or len(table) <= top_n:
+        return table
+    scores = score_candidates(persona, table, sectors)
+    ordered = sorted(table.symbols, key=lambda t: (-scores[t], t))
+    return table.select(ordered[:top_n])
@@ -0,0 +1,63 @@
+"""
+rate_limiter.py
+
+Thread-safe token-bucket limiter for API budgets expressed per minute, e.g.
+OpenAI's requests-per-minute (RPM) and tokens-per-minute (TPM) limits.
+
+Key class:
+- RateLimiter: acquire(tokens) blocks until both the request and token budgets allow the call.
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Two token buckets (requests and tokens) refilled continuously at
+    budget/60 per second. A budget of None or 0 means unlimited.
+    """
+
+    def __init__(self, requests_per_minute: float = None, tokens_per_minute: float = None):
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self._requests = float(self.requests_per_minute or 0)
+        self._tokens = float(self.tokens_per_minute or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """
+        Blocks until one request and `tokens` tokens are available, then spends them.
+        Returns the number of seconds spent waiting.
+        """
+        if self.tokens_per_minute:
+            tokens = min(tokens, self.tokens_per_minute)  # a single call can never exceed the bucket
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                need_requests = 1 - self._requests if self.requests_per_minute else 0
+                need_tokens = tokens - self._tokens if self.tokens_per_minute else 0
+                if need_requests <= 0 and need_tokens <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    if self.tokens_per_minute:
+                        self._tokens -= tokens
+                    return waited
+                delay = 0.0
+                if need_requests > 0:
+                    delay = max(delay, need_requests * 60.0 / self.requests_per_minute)
+                if need_tokens > 0:
+                    delay = max(delay, need_tokens * 60.0 / self.tokens_per_minute)
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,114 @@
+"""
+replay.py
+
+Record/replay layer for the upstream calls (Yahoo Finance, Yahoo screener,
+OpenAI). In "record" mode real responses are captured to a local fixture store;
+in "replay" mode they are served from it, with optional simulated latency, so
+the pipeline can be benchmarked reproducibly on a machine with no network.
+
+Configuration (environment, or set_mode() / main.py --replay):
+- REPLAY_MODE: "off" (default), "record" or "replay".
+- REPLAY_DIR: fixture directory (default .cache/replay).
+- REPLAY_LATENCY_MS: simulated latency in replay mode. Either one number for
+  every upstream, "recorded" to reuse the latency measured while recording, or
+  per-upstream values such as "yahoo=120,screener=300,openai=1500".
+
+Key function:
+- call(namespace, key, fetch, encode=None, decode=None): Wraps one upstream call.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+MODES = ("off", "record", "replay")
+
+_mode = os.getenv("REPLAY_MODE", "off").lower()
+_dir = os.getenv("REPLAY_DIR", os.path.join(".cache", "replay"))
+_latency = os.getenv("REPLAY_LATENCY_MS", "0")
+
+
+class ReplayMissError(KeyError):
+    """Raised in replay mode when no fixture was recorded for a call."""
+
+
+def set_mode(mode: str, directory: str = None, latency_ms: str = None):
+    global _mode, _dir, _latency
+    if mode not in MODES:
+        raise ValueError(f"Unknown replay mode {mode!r}; expected one of {MODES}")
+    _mode = mode
+    if directory:
+        _dir = directory
+    if latency_ms is not None:
+        _latency = str(latency_ms)
+
+
+def mode() -> str:
+    return _mode
+
+
+def _fixture_path(namespace: str, key) -> str:
+    digest = hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return os.path.join(_dir, namespace, f"{digest}.json")
+
+
+def _simulated_latency(namespace: str, recorded_ms: float) -> float:
+    """Seconds to sleep before returning a replayed response."""
+    spec = (_latency or "0").strip()
+    if spec == "recorded":
+        return recorded_ms / 1000.0
+    if "=" in spec:
+        for part in spec.split(","):
+            name, _, ms = part.partition("=")
+            if name.strip() == namespace:
+                return float(ms) / 1000.0
+        return 0.0
+    return float(spec) / 1000.0
+
+
+def call(namespace: str, key, fetch, encode=None, decode=None):
+    """
+    Runs `fetch()` according to the current mode.
+    - off: plain pass-through.
+    - record: runs fetch() and stores encode(result) under (namespace, key).
+    - replay: returns decode(stored) after the simulated latency, never calling fetch();
+      raises ReplayMissError if nothing was recorded, so callers take their fallback path.
+    `key` must be JSON-serializable; encode/decode convert non-JSON results (e.g. DataFrames).
+    """
+    if _mode == "off":
+        return fetch()
+
+    path = _fixture_path(namespace, key)
+
+    if _mode == "replay":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                fixture = json.load(f)
+        except FileNotFoundError:
+            raise ReplayMissError(f"No {namespace} fixture for {key!r}")
+        delay = _simulated_latency(namespace, fixture.get("latency_ms", 0.0))
+        if delay > 0:
+            time.sleep(delay)
+        value = fixture["value"]
+        return decode(value) if decode else value
+
+    start = time.perf_counter()
+    result = fetch()
+    fixture = {
+        "namespace": namespace,
+        "key": key,
+        "latency_ms": (time.perf_counter() - start) * 1000.0,
+        "value": encode(result) if encode else result,
+    }
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, default=str)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"[replay] Could not record {namespace} fixture: {e}")
+    return result
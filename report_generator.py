@@ -4,25 +4,32 @@ report_generator.py
 Takes the GPT-generated portfolio explanation and saves it to a Markdown (.md) file
 under the `reports/` directory. Filenames are based on the persona.
 
+Every save is also kept in the report store (see report_store.py): bodies are
+deduplicated by content hash and indexed by persona, inputs, time and tickers,
+so past reports can be listed without scanning the directory.
+
 Key function:
 - save_markdown_report(persona_name, content): Saves portfolio report as Markdown.
 """
 
-import os
+import metrics
+from report_store import get_report_store
 
-def save_markdown_report(persona_name: str, content: str, output_dir: str = "reports"):
+def save_markdown_report(persona_name: str, content: str, output_dir: str = "reports",
+                         inputs=None, tickers=None):
     """
-    Saves the GPT-generated portfolio explanation to a markdown file.
+    Saves the GPT-generated portfolio explanation to a markdown file, atomically,
+    and records it in the report store. `inputs` (any JSON-serializable value,
+    e.g. persona + signals) is hashed into the index for later lookup.
+    Returns the store record, or None if the write failed.
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    filename = f"{persona_name.lower().replace(' ', '_')}_report.md"
-    path = os.path.join(output_dir, filename)
-
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            f.write(content)
-        print(f"Report saved to {path}")
+        with metrics.span("report_generator.save"):
+            store = get_report_store(output_dir)
+            record = store.save(persona_name, content, inputs=inputs, tickers=tickers)
+        print(f"Report saved to {store.latest_path(persona_name)}")
+        return record
     except Exception as e:
-        print(f"Error writing report to {path}: {e}")
\ No newline at end of file
+        print(f"Error writing report for {persona_name} to {output_dir}: {e}")
+        metrics.incr("report_write_errors")
+        return None
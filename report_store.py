@@ -0,0 +1,271 @@
+"""
+report_store.py
+
+History of generated reports. Report bodies are stored once per distinct content
+(content-addressed by SHA-256, so identical reports share one file) and every
+save is recorded in a SQLite index with persona, inputs hash, timestamp and the
+recommended tickers. Listing and lookups are index queries, never directory scans.
+
+Files are written to a temp file in the target directory and renamed into place,
+so readers and concurrent writers never see a partial report.
+
+Layout under the store root (default `reports/`):
+    index.sqlite                  metadata index
+    objects/<2 hex>/<sha256>.md   report bodies (.md.gz once compressed)
+    <persona>_report.md           latest report per persona, as before
+
+Key class:
+- ReportStore: save(), list(), latest(), find(), read(), compress_archived().
+- get_report_store(): Returns the shared store for a root directory.
+- extract_tickers(): Tickers of the "- TICKER – Company" lines of a report.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import closing
+from typing import List
+
+from sqlite_store import SQLiteStore, StoreRegistry
+
+DEFAULT_ROOT = os.getenv("REPORT_STORE_DIR", "reports")
+
+# gzip new report bodies right away (otherwise only compress_archived() does)
+REPORT_COMPRESS = os.getenv("REPORT_COMPRESS", "0").lower() in ("1", "true", "yes")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    persona TEXT NOT NULL,
+    inputs_hash TEXT,
+    content_hash TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    tickers TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reports_persona ON reports (persona, created_at);
+CREATE INDEX IF NOT EXISTS reports_inputs ON reports (inputs_hash);
+CREATE INDEX IF NOT EXISTS reports_created ON reports (created_at);
+CREATE TABLE IF NOT EXISTS report_tickers (
+    report_id INTEGER NOT NULL,
+    ticker TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS report_tickers_ticker ON report_tickers (ticker, report_id);
+CREATE TABLE IF NOT EXISTS objects (
+    content_hash TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    compressed INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+# "- AAPL – Apple Inc." / "- **BRK.B** - Berkshire Hathaway"
+_TICKER_LINE = re.compile(r"^\s*[-*]\s*\**([A-Z][A-Z0-9.\-]{0,9})\**\s*[–—-]\s", re.MULTILINE)
+
+
+def extract_tickers(content: str) -> List[str]:
+    """Tickers of the recommendation lines of a report, in order of appearance."""
+    return list(dict.fromkeys(_TICKER_LINE.findall(content or "")))
+
+
+def inputs_hash(inputs) -> str:
+    """Stable hash of the JSON-serializable inputs a report was generated from."""
+    payload = json.dumps(inputs, sort_keys=True,
+                         default=lambda o: o.to_dict() if hasattr(o, "to_dict") else str(o))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _atomic_write(path: str, data: bytes):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _row_to_record(row) -> dict:
+    id_, persona, inputs, content_hash, created_at, tickers, path, compressed = row
+    return {
+        "id": id_,
+        "persona": persona,
+        "inputs_hash": inputs,
+        "content_hash": content_hash,
+        "created_at": created_at,
+        "tickers": tickers.split(",") if tickers else [],
+        "path": path,
+        "compressed": bool(compressed),
+    }
+
+
+_SELECT = (
+    "SELECT r.id, r.persona, r.inputs_hash, r.content_hash, r.created_at, r.tickers, o.path, o.compressed "
+    "FROM reports r JOIN objects o ON o.content_hash = r.content_hash"
+)
+
+
+class ReportStore(SQLiteStore):
+    """Content-addressed report bodies plus a SQLite metadata index (see sqlite_store.SQLiteStore)."""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, root: str = DEFAULT_ROOT, compress: bool = REPORT_COMPRESS):
+        self.root = root
+        self.compress = compress
+        os.makedirs(root, exist_ok=True)
+        super().__init__(os.path.join(root, "index.sqlite"))
+
+    def latest_path(self, persona: str) -> str:
+        return os.path.join(self.root, f"{persona.lower().replace(' ', '_')}_report.md")
+
+    def _object_path(self, content_hash: str, compressed: bool) -> str:
+        suffix = ".md.gz" if compressed else ".md"
+        return os.path.join(self.root, "objects", content_hash[:2], content_hash + suffix)
+
+    def save(self, persona: str, content: str, inputs=None, tickers: List[str] = None,
+             update_latest: bool = True) -> dict:
+        """
+        Stores `content` (once per distinct body), indexes this save and, by
+        default, atomically refreshes the persona's latest-report file.
+        Returns the index record.
+        """
+        data = content.encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        tickers = list(tickers) if tickers is not None else extract_tickers(content)
+        digest = inputs_hash(inputs) if inputs is not None else None
+        now = time.time()
+
+        def stored(conn):
+            row = conn.execute("SELECT path, compressed FROM objects WHERE content_hash = ?", (content_hash,)).fetchone()
+            return row if row is not None and os.path.exists(row[0]) else None
+
+        with closing(self._connect()) as conn:
+            known = stored(conn)
+        if known is None:
+            path = self._object_path(content_hash, self.compress)
+            _atomic_write(path, gzip.compress(data) if self.compress else data)
+
+        with closing(self._connect()) as conn, conn:
+            # Re-read under the write lock: compress_archived() may have moved the body since
+            conn.execute("BEGIN IMMEDIATE")
+            known = stored(conn)
+            if known is None:
+                known = (self._object_path(content_hash, self.compress), int(self.compress))
+                if not os.path.exists(known[0]):
+                    _atomic_write(known[0], gzip.compress(data) if self.compress else data)
+                conn.execute(
+                    "INSERT OR REPLACE INTO objects (content_hash, path, compressed, size) VALUES (?, ?, ?, ?)",
+                    (content_hash, known[0], known[1], len(data)),
+                )
+            cursor = conn.execute(
+                "INSERT INTO reports (persona, inputs_hash, content_hash, created_at, tickers) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (persona, digest, content_hash, now, ",".join(tickers)),
+            )
+            report_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO report_tickers (report_id, ticker) VALUES (?, ?)",
+                [(report_id, t) for t in tickers],
+            )
+
+        if update_latest:
+            _atomic_write(self.latest_path(persona), data)
+
+        return {
+            "id": report_id,
+            "persona": persona,
+            "inputs_hash": digest,
+            "content_hash": content_hash,
+            "created_at": now,
+            "tickers": tickers,
+            "path": known[0],
+            "compressed": bool(known[1]),
+        }
+
+    def list(self, persona: str = None, ticker: str = None, since: float = None,
+             until: float = None, limit: int = 100) -> List[dict]:
+        """Index records matching the filters, newest first."""
+        clauses, params = [], []
+        if persona is not None:
+            clauses.append("r.persona = ?")
+            params.append(persona)
+        if ticker is not None:
+            clauses.append("r.id IN (SELECT report_id FROM report_tickers WHERE ticker = ?)")
+            params.append(ticker)
+        if since is not None:
+            clauses.append("r.created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("r.created_at < ?")
+            params.append(until)
+        query = _SELECT + (" WHERE " + " AND ".join(clauses) if clauses else "")
+        query += " ORDER BY r.created_at DESC, r.id DESC LIMIT ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, [*params, limit]).fetchall()
+        return [_row_to_record(r) for r in rows]
+
+    def latest(self, persona: str) -> dict:
+        """Most recent record for `persona`, or None."""
+        found = self.list(persona=persona, limit=1)
+        return found[0] if found else None
+
+    def find(self, inputs) -> List[dict]:
+        """Records generated from the same inputs (newest first)."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                _SELECT + " WHERE r.inputs_hash = ? ORDER BY r.created_at DESC", (inputs_hash(inputs),)
+            ).fetchall()
+        return [_row_to_record(r) for r in rows]
+
+    def read(self, record: dict) -> str:
+        """Report body of an index record."""
+        with open(record["path"], "rb") as f:
+            data = f.read()
+        if record.get("compressed"):
+            data = gzip.decompress(data)
+        return data.decode("utf-8")
+
+    def compress_archived(self, older_than_seconds: float = 7 * 24 * 60 * 60) -> int:
+        """
+        Gzips bodies whose newest report is older than the cutoff.
+        Returns the number of bodies compressed.
+        """
+        cutoff = time.time() - older_than_seconds
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT o.content_hash, o.path FROM objects o JOIN reports r ON r.content_hash = o.content_hash "
+                "WHERE o.compressed = 0 GROUP BY o.content_hash HAVING MAX(r.created_at) < ?",
+                (cutoff,),
+            ).fetchall()
+        done = 0
+        for content_hash, path in rows:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                new_path = self._object_path(content_hash, True)
+                _atomic_write(new_path, gzip.compress(data))
+                with closing(self._connect()) as conn, conn:
+                    conn.execute(
+                        "UPDATE objects SET path = ?, compressed = 1 WHERE content_hash = ?", (new_path, content_hash)
+                    )
+                os.remove(path)
+                done += 1
+            except Exception as e:
+                print(f"[report_store] Could not compress {path}: {e}")
+        return done
+
+
+_stores = StoreRegistry(ReportStore)
+
+
+def get_report_store(root: str = DEFAULT_ROOT) -> ReportStore:
+    """Shared ReportStore per root directory (schema setup runs once per process)."""
+    return _stores.get(root)
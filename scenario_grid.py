@@ -0,0 +1,384 @@
+"""
+scenario_grid.py
+
+Precomputed results-page content for the Streamlit wizard. The wizard's inputs
+are small and discrete (personas x RISK_OPTIONS x HOLDING_PERIODS x subsets of
+INDUSTRIES), so the popular combinations are computed ahead of time by a
+background warmer and most results-page requests become a cache read.
+
+- Results (the rendered recommendation blocks) are stored per canonical
+  scenario key in a SQLite file shared by the app, the server and the warmer.
+  Every results-page request also counts towards a demand table, so the
+  combinations users actually pick are warmed first.
+- Freshness follows the US market: an entry is fresh if it was computed after
+  the latest close (plus CLOSE_SETTLE_MINUTES for closing prices to land).
+  The warmer evicts stale entries after each close and re-warms
+  WARM_LEAD_MINUTES before the next open. Exchange holidays are treated as
+  trading days (warming on one is harmless).
+- warm() groups the combinations by industry subset, so each group needs one
+  ticker selection and one signal fetch, and runs the groups on a process pool.
+
+Key class / functions:
+- ScenarioGrid: get(), put(), record_request(), popular(), evict_stale().
+- get_scenario_grid(): Returns the shared grid for a path.
+- scenario_key(): Canonical key of a set of wizard answers.
+- plan(limit): Combinations to warm (most requested first, then the base grid).
+- warm(limit, workers): Computes the planned combinations that are not fresh.
+- start_scenario_warmer(): Runs the market-hours schedule on a daemon thread.
+
+Usage: python3 scenario_grid.py [--once] [--evict] [--limit 150] [--workers 4]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import closing
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Dict, List
+
+import metrics
+from personas import build_persona, get_personas
+from sqlite_store import SQLiteStore, StoreRegistry
+
+# Wizard choices (app.py renders these)
+INDUSTRIES = [
+    "Technology", "Healthcare", "Finance", "Energy", "Consumer Goods",
+    "Utilities", "Real Estate", "Industrial", "Telecommunications"
+]
+RISK_OPTIONS = ["very low", "low", "moderate", "high"]
+HOLDING_PERIODS = ["1-3 years", "4-7 years", "10+ years"]
+
+# Ticker selection used for a results page
+TICKERS_PER_INDUSTRY = 5
+MAX_TICKERS = 15
+
+SCENARIO_GRID_PATH = os.getenv("SCENARIO_GRID_PATH", os.path.join(".cache", "scenario_grid.sqlite"))
+WARM_LIMIT = int(os.getenv("WARM_LIMIT", 150))        # combinations per warm run
+WARM_WORKERS = int(os.getenv("WARM_WORKERS", 4))      # processes
+WARM_LEAD_MINUTES = int(os.getenv("WARM_LEAD_MINUTES", 60))
+CLOSE_SETTLE_MINUTES = int(os.getenv("CLOSE_SETTLE_MINUTES", 30))
+
+MARKET_TIMEZONE = "America/New_York"
+MARKET_OPEN = dtime(9, 30)
+MARKET_CLOSE = dtime(16, 0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    answers TEXT NOT NULL,
+    blocks TEXT NOT NULL,
+    computed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS demand (
+    key TEXT PRIMARY KEY,
+    answers TEXT NOT NULL,
+    requests INTEGER NOT NULL,
+    last_requested REAL NOT NULL
+);
+"""
+
+
+def _market_tz():
+    try:
+        from zoneinfo import ZoneInfo
+
+        return ZoneInfo(MARKET_TIMEZONE)
+    except Exception:
+        # No tz database (e.g. Windows without tzdata): fixed EST, off by an hour in summer
+        return timezone(timedelta(hours=-5))
+
+
+def _next_weekday_at(now: datetime, at: dtime, offset: timedelta) -> datetime:
+    """First Monday-Friday `at` + `offset` strictly after `now` (market time)."""
+    for days in range(8):
+        day = (now + timedelta(days=days)).date()
+        moment = datetime.combine(day, at, tzinfo=now.tzinfo) + offset
+        if day.weekday() < 5 and moment > now:
+            return moment
+    raise AssertionError("unreachable")
+
+
+def last_close(now: datetime = None) -> datetime:
+    """Latest weekday close (+ settle time) at or before `now`; entries older than this are stale."""
+    now = now or datetime.now(_market_tz())
+    settle = timedelta(minutes=CLOSE_SETTLE_MINUTES)
+    for days in range(8):
+        day = (now - timedelta(days=days)).date()
+        moment = datetime.combine(day, MARKET_CLOSE, tzinfo=now.tzinfo) + settle
+        if day.weekday() < 5 and moment <= now:
+            return moment
+    raise AssertionError("unreachable")
+
+
+def next_eviction(now: datetime = None) -> datetime:
+    now = now or datetime.now(_market_tz())
+    return _next_weekday_at(now, MARKET_CLOSE, timedelta(minutes=CLOSE_SETTLE_MINUTES))
+
+
+def next_warm(now: datetime = None) -> datetime:
+    now = now or datetime.now(_market_tz())
+    return _next_weekday_at(now, MARKET_OPEN, -timedelta(minutes=WARM_LEAD_MINUTES))
+
+
+def answers_for(persona_key: str, scenario: str = "", risk: str = None, holding: str = None,
+                industries: List[str] = None) -> dict:
+    """Wizard answers in canonical form (normalized scenario, sorted industries)."""
+    return {
+        "persona_key": persona_key,
+        "scenario": " ".join((scenario or "").lower().split()),
+        "risk": risk,
+        "holding": holding,
+        "industries": sorted(industries or []),
+    }
+
+
+def scenario_key(persona_key: str, scenario: str = "", risk: str = None, holding: str = None,
+                 industries: List[str] = None) -> str:
+    """Canonical key of a set of wizard answers; equivalent answers share a key."""
+    a = answers_for(persona_key, scenario, risk, holding, industries)
+    return json.dumps({
+        "persona": a["persona_key"],
+        "scenario": a["scenario"],
+        "risk": a["risk"],
+        "holding": a["holding"],
+        "industries": a["industries"],
+    }, sort_keys=True)
+
+
+class ScenarioGrid(SQLiteStore):
+    """Precomputed result blocks plus request counts (see sqlite_store.SQLiteStore)."""
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, path: str = SCENARIO_GRID_PATH):
+        super().__init__(path)
+
+    def get(self, key: str):
+        """Blocks stored for `key` if computed since the latest close, else None."""
+        cutoff = last_close().timestamp()
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT blocks FROM results WHERE key = ? AND computed_at >= ?", (key, cutoff)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, blocks: List[str], answers: dict):
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, answers, blocks, computed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(answers, sort_keys=True), json.dumps(blocks), time.time()),
+            )
+
+    def record_request(self, key: str, answers: dict):
+        """Counts one results-page request for these answers."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO demand (key, answers, requests, last_requested) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET requests = requests + 1, last_requested = excluded.last_requested",
+                (key, json.dumps(answers, sort_keys=True), time.time()),
+            )
+
+    def popular(self, limit: int = WARM_LIMIT) -> List[dict]:
+        """Answers of the most requested combinations, most requested first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT answers FROM demand ORDER BY requests DESC, last_requested DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def fresh_keys(self) -> set:
+        cutoff = last_close().timestamp()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT key FROM results WHERE computed_at >= ?", (cutoff,)).fetchall()
+        return {r[0] for r in rows}
+
+    def evict_stale(self) -> int:
+        """Deletes entries computed before the latest close. Returns how many were removed."""
+        cutoff = last_close().timestamp()
+        with closing(self._connect()) as conn, conn:
+            return conn.execute("DELETE FROM results WHERE computed_at < ?", (cutoff,)).rowcount
+
+    def stats(self) -> dict:
+        cutoff = last_close().timestamp()
+        with closing(self._connect()) as conn:
+            total, fresh = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(computed_at >= ?), 0) FROM results", (cutoff,)
+            ).fetchone()
+            tracked = conn.execute("SELECT COUNT(*) FROM demand").fetchone()[0]
+        return {"entries": total, "fresh": fresh, "tracked_combinations": tracked}
+
+
+_grids = StoreRegistry(ScenarioGrid)
+
+
+def get_scenario_grid(path: str = SCENARIO_GRID_PATH) -> ScenarioGrid:
+    """Shared ScenarioGrid per file (schema setup runs once per process)."""
+    return _grids.get(path)
+
+
+def plan(limit: int = WARM_LIMIT, grid: ScenarioGrid = None) -> List[dict]:
+    """
+    Up to `limit` combinations to warm: the most requested ones first, then the
+    base grid (every persona x risk x holding period with no industry selected,
+    then with each single industry).
+    """
+    grid = grid or get_scenario_grid()
+    planned: Dict[str, dict] = {}
+
+    def add(answers):
+        if len(planned) < limit:
+            planned.setdefault(scenario_key(**answers), answers)
+
+    for answers in grid.popular(limit):
+        add(answers)
+    for industries in [[]] + [[i] for i in INDUSTRIES]:
+        for persona_key in get_personas():
+            for risk in RISK_OPTIONS:
+                for holding in HOLDING_PERIODS:
+                    add(answers_for(persona_key, "", risk, holding, industries))
+    return list(planned.values())
+
+
+def compute_blocks(answers: dict, tickers: List[str] = None, signals=None) -> List[str]:
+    """
+    The results page for `answers`, as the app computes it (tickers/signals may
+    be passed in). None if the response was cut off, so it is never stored.
+    """
+    from data_fetch import get_live_signals
+    from gpt_utils import stream_portfolio_with_gpt
+    from industry_select import fetch_tickers_by_industries
+    from optimizer import allocate_for_persona
+
+    persona = build_persona(answers["persona_key"], answers["scenario"], answers["risk"],
+                            answers["holding"], answers["industries"])
+    if signals is None:
+        if tickers is None:
+            tickers = fetch_tickers_by_industries(answers["industries"], per_industry=TICKERS_PER_INDUSTRY,
+                                                  max_total=MAX_TICKERS)
+        signals = get_live_signals(tickers)
+    allocation = allocate_for_persona(persona, signals)
+    status = {}
+    blocks = list(stream_portfolio_with_gpt(persona, signals, allocation=allocation, status=status))
+    return blocks if status["complete"] else None
+
+
+def _warm_group(industries: List[str], combos: List[dict], path: str):
+    """Process-pool task: one ticker selection + signal fetch, then every combination of the group."""
+    from data_fetch import get_live_signals
+    from gpt_utils import FALLBACK_MESSAGE
+    from industry_select import fetch_tickers_by_industries
+
+    grid = get_scenario_grid(path)
+    tickers = fetch_tickers_by_industries(industries, per_industry=TICKERS_PER_INDUSTRY, max_total=MAX_TICKERS)
+    signals = get_live_signals(tickers)
+    warmed = 0
+    for answers in combos:
+        try:
+            blocks = compute_blocks(answers, signals=signals)
+        except Exception as e:
+            print(f"[scenario_grid] Could not warm {scenario_key(**answers)}: {e}")
+            continue
+        if blocks and blocks != [FALLBACK_MESSAGE]:
+            grid.put(scenario_key(**answers), blocks, answers)
+            warmed += 1
+    return warmed
+
+
+def warm(limit: int = WARM_LIMIT, workers: int = WARM_WORKERS, path: str = SCENARIO_GRID_PATH,
+         force: bool = False) -> dict:
+    """
+    Computes the planned combinations that have no fresh entry (all of them
+    with force=True), one industry subset per process-pool task.
+    Returns {"planned", "skipped", "warmed", "failed", "seconds"}.
+    """
+    grid = get_scenario_grid(path)
+    combos = plan(limit, grid)
+    fresh = set() if force else grid.fresh_keys()
+    todo = [a for a in combos if scenario_key(**a) not in fresh]
+
+    groups: Dict[tuple, List[dict]] = {}
+    for answers in todo:
+        groups.setdefault(tuple(answers["industries"]), []).append(answers)
+
+    started = time.perf_counter()
+    warmed = 0
+    with metrics.span("scenario_grid.warm", combinations=len(todo), groups=len(groups)):
+        if groups:
+            # spawn: workers must not inherit the parent's threads and open connections
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(groups))), mp_context=context) as pool:
+                futures = {pool.submit(_warm_group, list(k), v, path): k for k, v in groups.items()}
+                for future in as_completed(futures):
+                    try:
+                        warmed += future.result()
+                    except Exception as e:
+                        print(f"[scenario_grid] Warm group {list(futures[future]) or 'default'} failed: {e}")
+    summary = {
+        "planned": len(combos),
+        "skipped": len(combos) - len(todo),
+        "warmed": warmed,
+        "failed": len(todo) - warmed,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    metrics.incr("scenarios_warmed", warmed)
+    print(f"[scenario_grid] Warmed {warmed}/{len(todo)} combinations ({summary['skipped']} already fresh) "
+          f"in {summary['seconds']}s")
+    return summary
+
+
+def run_schedule(limit: int = WARM_LIMIT, workers: int = WARM_WORKERS, path: str = SCENARIO_GRID_PATH):
+    """Warms now, then evicts after every close and re-warms before every open. Runs forever."""
+    grid = get_scenario_grid(path)
+    grid.evict_stale()
+    warm(limit, workers, path)
+    while True:
+        now = datetime.now(_market_tz())
+        evict_at, warm_at = next_eviction(now), next_warm(now)
+        wake = min(evict_at, warm_at)
+        print(f"[scenario_grid] Next {'eviction' if wake == evict_at else 'warm'} at {wake.isoformat()}")
+        time.sleep(max(0.0, (wake - datetime.now(_market_tz())).total_seconds()))
+        try:
+            if wake == evict_at:
+                removed = grid.evict_stale()
+                print(f"[scenario_grid] Evicted {removed} stale entries after the close")
+            else:
+                warm(limit, workers, path)
+        except Exception as e:
+            print(f"[scenario_grid] Scheduled run failed: {e}")
+
+
+def start_scenario_warmer(limit: int = WARM_LIMIT, workers: int = WARM_WORKERS,
+                          path: str = SCENARIO_GRID_PATH) -> threading.Thread:
+    """Runs run_schedule() on a daemon thread (the work itself happens in worker processes)."""
+    thread = threading.Thread(target=run_schedule, args=(limit, workers, path),
+                              name="scenario-warmer", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute results for popular wizard combinations.")
+    parser.add_argument("--once", action="store_true", help="warm now and exit (default: run the schedule)")
+    parser.add_argument("--evict", action="store_true", help="evict stale entries and exit")
+    parser.add_argument("--force", action="store_true", help="with --once, recompute fresh entries too")
+    parser.add_argument("--limit", type=int, default=WARM_LIMIT, help="combinations per warm run")
+    parser.add_argument("--workers", type=int, default=WARM_WORKERS, help="worker processes")
+    parser.add_argument("--grid", default=SCENARIO_GRID_PATH)
+    args = parser.parse_args(argv)
+
+    grid = get_scenario_grid(args.grid)
+    if args.evict:
+        print(f"Evicted {grid.evict_stale()} stale entries")
+    elif args.once:
+        warm(args.limit, args.workers, args.grid, force=args.force)
+    else:
+        run_schedule(args.limit, args.workers, args.grid)
+    print(grid.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,359 @@
+"""
+sentiment_index.py
+
+Local sentiment scores per ticker, computed from a corpus of headlines/filings
+on disk and stored in an index keyed by (ticker, date). Nothing here touches
+the network: get_live_signals() reads the latest composite score per ticker
+from an in-memory dict. The dict is rebuilt when the index gains documents
+(e.g. from a separate `--watch` process) or the day changes; that check runs
+at most every SENTIMENT_RELOAD_SECONDS.
+
+Corpus: JSON-lines files (*.jsonl) under SENTIMENT_CORPUS_DIR, one document per
+line: {"ticker": "AAPL", "date": "2024-05-02", "text": "Apple beats estimates..."}.
+Files are treated as append-only; each ingest only reads lines added since the
+previous one, and documents already scored (same ticker/date/text) are skipped.
+
+Scoring is a finance word lexicon applied to the whole batch at once with NumPy
+(token -> polarity lookup over the batch vocabulary, then per-document sums).
+Daily rows keep positive/negative hit counts, so new documents simply add to
+them. A ticker's composite score weights its days with an exponential decay
+by age (from today) and maps net tone to 0..1 (0.5 = neutral).
+
+Key class:
+- SentimentIndex: scores() in-memory lookups, ingest() incremental batch scoring, daily().
+- get_sentiment_index(): Returns the shared index and ingests new corpus lines in the background.
+- score_texts(): Vectorized lexicon scoring of a batch of texts.
+
+Usage: python3 sentiment_index.py [--corpus DIR] [--watch SECONDS]
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextlib import closing
+from datetime import date
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+import metrics
+from sqlite_store import SQLiteStore, StoreRegistry
+
+DEFAULT_DB_PATH = os.getenv("SENTIMENT_INDEX_PATH", os.path.join(".cache", "sentiment.sqlite"))
+DEFAULT_CORPUS_DIR = os.getenv("SENTIMENT_CORPUS_DIR", os.path.join("data", "news"))
+
+# Composite score: days older than the window are ignored, newer ones decay by half-life
+SENTIMENT_WINDOW_DAYS = 30
+SENTIMENT_HALF_LIFE_DAYS = 7
+# Neutral pseudo-hits added to every composite, so one headline cannot pin a ticker at 0 or 1
+SENTIMENT_PRIOR_HITS = 2
+# How often lookups check the index for documents added by other processes
+SENTIMENT_RELOAD_SECONDS = float(os.getenv("SENTIMENT_RELOAD_SECONDS", 30))
+
+POSITIVE_WORDS = """
+beat beats exceeded exceeds outperform outperformed outperforms upgrade upgraded upgrades
+growth grew gain gains gained surge surged surges rally rallied record strong stronger
+strength profit profits profitable profitability rebound rebounded boost boosted raise
+raised raises bullish optimistic optimism upbeat expand expanded expansion improve
+improved improvement improves innovative innovation breakthrough win wins won approval
+approved dividend buyback momentum robust resilient accelerate accelerated soar soared
+soars success successful exceed positive opportunity opportunities leading leader
+""".split()
+
+NEGATIVE_WORDS = """
+miss missed misses underperform underperformed downgrade downgraded downgrades decline
+declined declines drop dropped drops fall fell falls loss losses losing weak weaker
+weakness plunge plunged plunges slump slumped bearish pessimistic warning warns warned
+cut cuts lawsuit lawsuits probe investigation fraud recall recalled layoff layoffs
+bankruptcy default defaults risk risks volatile volatility concern concerns delay
+delayed delays fine fined penalty shortfall slowdown slowing downturn negative halt
+halted crisis tumble tumbled tumbles
+""".split()
+
+_LEXICON = {**{w: 1 for w in POSITIVE_WORDS}, **{w: -1 for w in NEGATIVE_WORDS}}
+_TOKEN_RE = re.compile(r"[a-z]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS daily (
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL,
+    positive INTEGER NOT NULL,
+    negative INTEGER NOT NULL,
+    docs INTEGER NOT NULL,
+    PRIMARY KEY (ticker, date)
+);
+CREATE TABLE IF NOT EXISTS ingest_log (
+    path TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+
+
+def score_texts(texts: List[str]):
+    """
+    (positive, negative) lexicon hit counts per text, as two int arrays.
+    Tokens of the whole batch are looked up once per distinct word.
+    """
+    tokens_per_doc = [_TOKEN_RE.findall(t.lower()) for t in texts]
+    lengths = np.fromiter((len(t) for t in tokens_per_doc), dtype=np.int64, count=len(texts))
+    if not lengths.sum():
+        zeros = np.zeros(len(texts), dtype=np.int64)
+        return zeros, zeros.copy()
+    flat = np.array([tok for doc in tokens_per_doc for tok in doc], dtype=object)
+    vocab, inverse = np.unique(flat, return_inverse=True)
+    polarity = np.array([_LEXICON.get(w, 0) for w in vocab], dtype=np.int64)[inverse]
+    doc_ids = np.repeat(np.arange(len(texts)), lengths)
+    positive = np.bincount(doc_ids, weights=polarity > 0, minlength=len(texts)).astype(np.int64)
+    negative = np.bincount(doc_ids, weights=polarity < 0, minlength=len(texts)).astype(np.int64)
+    return positive, negative
+
+
+def _doc_id(ticker: str, day: str, text: str) -> str:
+    return hashlib.sha256(f"{ticker}\n{day}\n{text}".encode("utf-8")).hexdigest()
+
+
+class SentimentIndex(SQLiteStore):
+    """
+    Daily lexicon counts per (ticker, date) in SQLite, plus an in-memory dict of
+    each ticker's composite score. Lookups only touch the disk for the periodic
+    reload check.
+    """
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self._scores: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        super().__init__(path)
+        self._version = self._current_version()
+        self._checked_at = time.monotonic()
+        self._recompute()
+
+    def __len__(self):
+        self._reload_if_changed()
+        return len(self._scores)
+
+    def score(self, ticker: str, default: float = None) -> float:
+        """Composite 0..1 sentiment for `ticker`, or `default` if it has no documents."""
+        self._reload_if_changed()
+        return self._scores.get(ticker, default)
+
+    def scores(self, tickers: Iterable[str]) -> Dict[str, float]:
+        """ticker -> composite score, for the tickers that have one."""
+        self._reload_if_changed()
+        scores = self._scores
+        return {t: scores[t] for t in tickers if t in scores}
+
+    def _current_version(self) -> tuple:
+        """(last document rowid, today): documents are insert-only, so new ones raise the rowid."""
+        with closing(self._connect()) as conn:
+            last_doc = conn.execute("SELECT MAX(rowid) FROM documents").fetchone()[0]
+        return last_doc or 0, date.today().toordinal()
+
+    def _reload_if_changed(self):
+        """Rebuilds the scores if documents were added or the day changed (at most every SENTIMENT_RELOAD_SECONDS)."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < SENTIMENT_RELOAD_SECONDS:
+                return
+            self._checked_at = now
+        try:
+            version = self._current_version()
+            if version != self._version:
+                self._recompute()
+                self._version = version
+        except Exception as e:
+            print(f"[sentiment_index] Reload check failed: {e}")
+
+    def daily(self, ticker: str) -> List[dict]:
+        """Per-day rows for `ticker` (oldest first) with the day's own 0..1 score."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT date, positive, negative, docs FROM daily WHERE ticker = ? ORDER BY date", (ticker,)
+            ).fetchall()
+        return [
+            {"date": d, "docs": n, "score": 0.5 + 0.5 * (p - q) / (p + q) if p + q else 0.5}
+            for d, p, q, n in rows
+        ]
+
+    def _recompute(self, tickers: Iterable[str] = None):
+        """Rebuilds composite scores (for `tickers`, or all) from the daily table."""
+        query = "SELECT ticker, date, positive, negative FROM daily"
+        params: list = []
+        if tickers is not None:
+            tickers = list(tickers)
+            if not tickers:
+                return
+            query += f" WHERE ticker IN ({','.join('?' * len(tickers))})"
+            params = tickers
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        by_ticker: Dict[str, list] = {}
+        for ticker, day, pos, neg in rows:
+            by_ticker.setdefault(ticker, []).append((date.fromisoformat(day).toordinal(), pos, neg))
+
+        today = date.today().toordinal()
+        fresh = {}
+        for ticker, days in by_ticker.items():
+            ordinals, pos, neg = (np.array(col, dtype=float) for col in zip(*days))
+            age = np.maximum(today - ordinals, 0)  # future-dated documents count as today
+            weight = np.where(age <= SENTIMENT_WINDOW_DAYS, 0.5 ** (age / SENTIMENT_HALF_LIFE_DAYS), 0.0)
+            hits = float((weight * (pos + neg)).sum())
+            if hits:
+                net = float((weight * (pos - neg)).sum())
+                fresh[ticker] = round(0.5 + 0.5 * net / (hits + SENTIMENT_PRIOR_HITS), 4)
+        with self._lock:
+            if tickers is None:
+                self._scores = fresh
+            else:
+                for t in tickers:
+                    self._scores.pop(t, None)
+                self._scores.update(fresh)
+
+    def add_documents(self, documents: List[dict]) -> int:
+        """
+        Scores a batch of {"ticker", "date", "text"} documents and adds them to
+        the index. Already indexed documents are skipped. Returns the number added.
+        """
+        docs = {}
+        for d in documents:
+            ticker = str(d.get("ticker") or "").strip().upper()
+            text = d.get("text") or ""
+            try:
+                day = date.fromisoformat(str(d.get("date"))[:10]).isoformat()
+            except ValueError:
+                continue
+            if ticker and text:
+                docs[_doc_id(ticker, day, text)] = (ticker, day, text)
+        if not docs:
+            return 0
+
+        with closing(self._connect()) as conn:
+            known = set()
+            ids = list(docs)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                known.update(r[0] for r in conn.execute(
+                    f"SELECT doc_id FROM documents WHERE doc_id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+        new_ids = [i for i in docs if i not in known]
+        if not new_ids:
+            return 0
+
+        with metrics.span("sentiment_index.score", documents=len(new_ids)):
+            positive, negative = score_texts([docs[i][2] for i in new_ids])
+
+        # One write transaction: only documents this call actually inserts add to the
+        # daily totals, so overlapping ingests (app + --watch) cannot count one twice
+        totals: Dict[tuple, list] = {}
+        with closing(self._connect()) as conn, conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for i, doc_id in enumerate(new_ids):
+                ticker, day, _ = docs[doc_id]
+                inserted = conn.execute(
+                    "INSERT OR IGNORE INTO documents (doc_id, ticker, date) VALUES (?, ?, ?)", (doc_id, ticker, day)
+                ).rowcount
+                if not inserted:
+                    continue
+                t = totals.setdefault((ticker, day), [0, 0, 0])
+                t[0] += int(positive[i])
+                t[1] += int(negative[i])
+                t[2] += 1
+            conn.executemany(
+                "INSERT INTO daily (ticker, date, positive, negative, docs) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(ticker, date) DO UPDATE SET positive = positive + excluded.positive, "
+                "negative = negative + excluded.negative, docs = docs + excluded.docs",
+                [(t, d, p, n, c) for (t, d), (p, n, c) in totals.items()],
+            )
+        added = sum(c for _, _, c in totals.values())
+        self._recompute({t for t, _ in totals})
+        metrics.incr("sentiment_documents", added)
+        return added
+
+    def ingest(self, corpus_dir: str = DEFAULT_CORPUS_DIR) -> int:
+        """
+        Scores the lines appended to the corpus files since the last ingest.
+        Returns the number of new documents.
+        """
+        paths = sorted(glob.glob(os.path.join(corpus_dir, "**", "*.jsonl"), recursive=True))
+        if not paths:
+            return 0
+        with closing(self._connect()) as conn:
+            offsets = dict(conn.execute("SELECT path, offset FROM ingest_log").fetchall())
+
+        added = 0
+        for path in paths:
+            key = os.path.abspath(path)
+            offset = offsets.get(key, 0)
+            if os.path.getsize(path) < offset:
+                offset = 0  # file was rewritten; document ids keep re-reads idempotent
+            documents = []
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break  # partially written line; pick it up next time
+                    offset += len(raw)
+                    try:
+                        documents.append(json.loads(raw))
+                    except ValueError:
+                        print(f"[sentiment_index] Skipping malformed line in {path}")
+            added += self.add_documents(documents)
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO ingest_log (path, offset) VALUES (?, ?)", (key, offset))
+        return added
+
+
+def _open_index(path: str, corpus_dir: str) -> SentimentIndex:
+    index = SentimentIndex(path)
+
+    def run():
+        try:
+            index.ingest(corpus_dir)
+        except Exception as e:
+            print(f"[sentiment_index] Corpus ingest failed: {e}")
+
+    # Catch up on the corpus off the request path; lookups serve the stored scores meanwhile
+    threading.Thread(target=run, name="sentiment-ingest", daemon=True).start()
+    return index
+
+
+_indexes = StoreRegistry(_open_index)
+
+
+def get_sentiment_index(path: str = DEFAULT_DB_PATH, corpus_dir: str = DEFAULT_CORPUS_DIR) -> SentimentIndex:
+    """Shared SentimentIndex per path; new corpus lines are ingested in the background when it is first loaded."""
+    return _indexes.get(path, corpus_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score new corpus documents into the sentiment index.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS_DIR, help="directory of *.jsonl documents")
+    parser.add_argument("--index", default=DEFAULT_DB_PATH, help="SQLite index path")
+    parser.add_argument("--watch", type=float, default=None, help="keep ingesting every N seconds")
+    args = parser.parse_args(argv)
+
+    index = SentimentIndex(args.index)
+    while True:
+        start = time.perf_counter()
+        added = index.ingest(args.corpus)
+        print(f"Ingested {added} new documents in {time.perf_counter() - start:.2f}s "
+              f"({len(index)} tickers scored)")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
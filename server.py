@@ -0,0 +1,230 @@
+"""
+server.py
+
+Async HTTP service exposing the recommendation pipeline
+(persona -> tickers -> signals -> recommendation) to internal clients.
+
+- Concurrent identical requests are coalesced (single flight): N simultaneous
+  requests with the same inputs share one ticker fetch, one signal download and
+  one LLM call. Signal downloads are also shared across personas that ended up
+  with the same ticker set.
+- The blocking pipeline steps (yfinance/yahooquery downloads, the OpenAI call)
+  run on a bounded thread pool, so the event loop only awaits them.
+- Upstream connections are pooled: the OpenAI client is created once at startup
+  and reused by every request (see gpt_utils.get_client()); Yahoo downloads are
+  batched per request (see data_fetch.get_price_returns()).
+
+FastAPI and uvicorn are optional dependencies, needed only for this service:
+    pip install fastapi uvicorn
+    python3 server.py [--host 127.0.0.1] [--port 8000]
+
+Endpoints:
+- GET  /health
+- GET  /personas
+- POST /tickers           {"industries": [...], "per_industry": 5, "max_total": 15}
+- POST /signals           {"tickers": [...]}
+- POST /recommendations   {"persona_key": "college_student", "scenario": "...", "risk": "low",
+                           "holding": "4-7 years", "industries": [...], "top_n": 8, "optimize": true}
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import circuit_breaker
+import metrics
+from personas import build_persona, get_personas
+
+try:
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+except ImportError:  # optional: only this service needs them
+    FastAPI = None
+    BaseModel = object
+
+# Threads for blocking pipeline work (network I/O and the LLM call)
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", 8))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    work, later callers await the same result (or exception). Nothing is cached
+    once the call completes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn):
+        """Awaits fn() (a coroutine function), shared with concurrent callers of `key`."""
+        task = self._calls.get(key)
+        if task is None:
+            # Run as its own task, so a disconnecting first caller does not cancel the others
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            metrics.incr("coalesced_requests")
+        return await asyncio.shield(task)
+
+
+def _key(*parts) -> str:
+    return json.dumps(parts, sort_keys=True, default=str)
+
+
+class Pipeline:
+    """The pipeline stages as coroutines, run on a bounded executor with single-flight coalescing."""
+
+    def __init__(self, workers: int = SERVICE_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        self.flights = SingleFlight()
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, metrics.bind(lambda: fn(*args, **kwargs)))
+
+    async def tickers(self, industries: List[str], per_industry: int = 5, max_total: int = 15) -> List[str]:
+        from industry_select import fetch_tickers_by_industries
+
+        key = _key("tickers", sorted(industries or []), per_industry, max_total)
+        return await self.flights.do(key, lambda: self._run(
+            fetch_tickers_by_industries, industries, per_industry=per_industry, max_total=max_total
+        ))
+
+    async def signals(self, tickers: List[str]) -> dict:
+        from data_fetch import get_live_signals
+
+        key = _key("signals", sorted(set(tickers)))
+        return await self.flights.do(key, lambda: self._run(get_live_signals, tickers))
+
+    async def recommend(self, persona_key: str, scenario: str = None, risk: str = None, holding: str = None,
+                        industries: List[str] = None, top_n: int = None, optimize: bool = True) -> dict:
+        persona = build_persona(persona_key, scenario, risk, holding, industries)
+        key = _key(
+            "recommend", persona_key, " ".join((scenario or "").lower().split()), risk, holding,
+            sorted(industries or []), top_n, optimize,
+        )
+
+        async def run():
+            from gpt_utils import FALLBACK_MESSAGE, build_portfolio_with_gpt
+            from optimizer import allocate_for_persona
+
+            with metrics.span("server.recommend"):
+                tickers = await self.tickers(industries or [])
+                signals = await self.signals(tickers)
+                allocation = await self._run(allocate_for_persona, persona, signals) if optimize else None
+                text = await self._run(build_portfolio_with_gpt, persona, signals, top_n=top_n,
+                                       allocation=allocation)
+            return {
+                "persona": persona_key,
+                "tickers": tickers,
+                "signals": signals.to_dict(),
+                "allocation": allocation,
+                "recommendation": text,
+                "ok": text != FALLBACK_MESSAGE,
+            }
+
+        return await self.flights.do(key, run)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+class TickersRequest(BaseModel):
+    industries: List[str] = []
+    per_industry: int = 5
+    max_total: int = 15
+
+
+class SignalsRequest(BaseModel):
+    tickers: List[str]
+
+
+class RecommendationRequest(BaseModel):
+    persona_key: str = "college_student"
+    scenario: Optional[str] = None
+    risk: Optional[str] = None
+    holding: Optional[str] = None
+    industries: List[str] = []
+    top_n: Optional[int] = None
+    optimize: bool = True
+
+
+def create_app(pipeline: Pipeline = None):
+    """FastAPI app serving `pipeline` (a new one by default)."""
+    if FastAPI is None:
+        raise RuntimeError("The HTTP service needs FastAPI: pip install fastapi uvicorn")
+
+    pipeline = pipeline or Pipeline()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Create the shared OpenAI client (and its connection pool) before the first request
+        from gpt_utils import get_client
+        from industry_select import start_universe_refresher
+
+        try:
+            await pipeline._run(get_client)
+        except Exception as e:
+            print(f"[server] OpenAI client not ready: {e}")
+        # Keep the screener collections fresh in the background (UNIVERSE_REFRESH_SECONDS)
+        start_universe_refresher()
+        yield
+        pipeline.close()
+
+    app = FastAPI(title="Investment Analyst", lifespan=lifespan)
+
+    @app.get("/health")
+    async def health():
+        return {
+            "status": "ok",
+            "in_flight": pipeline.flights.in_flight(),
+            "upstreams": circuit_breaker.states(),
+        }
+
+    @app.get("/personas")
+    async def personas():
+        return get_personas()
+
+    @app.post("/tickers")
+    async def tickers(req: TickersRequest):
+        return {"tickers": await pipeline.tickers(req.industries, req.per_industry, req.max_total)}
+
+    @app.post("/signals")
+    async def signals(req: SignalsRequest):
+        if not req.tickers:
+            raise HTTPException(status_code=422, detail="tickers must not be empty")
+        return {"signals": (await pipeline.signals(req.tickers)).to_dict()}
+
+    @app.post("/recommendations")
+    async def recommendations(req: RecommendationRequest):
+        if req.persona_key not in get_personas():
+            raise HTTPException(status_code=404, detail=f"unknown persona: {req.persona_key}")
+        return await pipeline.recommend(
+            req.persona_key, req.scenario, req.risk, req.holding, req.industries, req.top_n, req.optimize
+        )
+
+    app.state.pipeline = pipeline
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the recommendation pipeline over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
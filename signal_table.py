@@ -0,0 +1,122 @@
+"""
+signal_table.py
+
+Columnar container for per-ticker signals. One float64 matrix (rows = symbols,
+columns = metrics, stored column-major so each metric is contiguous) plus a
+symbol -> row index, instead of a dict of dicts.
+
+- column("return") is a view, not a copy; select()/filter() use fancy indexing.
+- to_pandas() wraps the matrix in a DataFrame without copying it.
+- It is a read-only Mapping of ticker -> {metric: value}, so code written for
+  the old dict-of-dicts signals (`signals[t]["return"]`, `.items()`, `dict(...)`)
+  keeps working. Missing values are NaN.
+
+Key class:
+- SignalTable: from_signals(), column(), select(), filter(), to_pandas(), to_dict().
+"""
+
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, Iterable, List
+
+import numpy as np
+
+if TYPE_CHECKING:  # pandas is imported lazily by to_pandas()
+    import pandas as pd
+
+
+class SignalTable(Mapping):
+    def __init__(self, symbols: Iterable[str], columns: Dict[str, Iterable[float]]):
+        self.symbols: List[str] = list(symbols)
+        self.names: List[str] = list(columns)
+        self._rows = {s: i for i, s in enumerate(self.symbols)}
+        if len(self._rows) != len(self.symbols):
+            raise ValueError("SignalTable symbols must be unique")
+        matrix = np.empty((len(self.symbols), len(self.names)), dtype=float, order="F")
+        for j, name in enumerate(self.names):
+            matrix[:, j] = np.asarray(columns[name], dtype=float)
+        self._matrix = matrix
+        self._cols = {name: j for j, name in enumerate(self.names)}
+
+    @classmethod
+    def _from_matrix(cls, symbols: List[str], names: List[str], matrix: np.ndarray) -> "SignalTable":
+        table = cls.__new__(cls)
+        table.symbols = list(symbols)
+        table.names = list(names)
+        table._rows = {s: i for i, s in enumerate(table.symbols)}
+        table._matrix = np.asfortranarray(matrix, dtype=float)
+        table._cols = {name: j for j, name in enumerate(table.names)}
+        return table
+
+    @classmethod
+    def from_signals(cls, signals) -> "SignalTable":
+        """A SignalTable as is, or one built from a {ticker: {metric: value}} dict."""
+        if isinstance(signals, SignalTable):
+            return signals
+        names = list(dict.fromkeys(m for info in signals.values() for m in info))
+        columns = {m: [_as_float(info.get(m)) for info in signals.values()] for m in names}
+        return cls(list(signals), columns)
+
+    # Mapping interface (dict-compatible view) ---------------------------------
+
+    def __getitem__(self, symbol: str) -> dict:
+        return dict(zip(self.names, self._matrix[self._rows[symbol]].tolist()))
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self._rows
+
+    def __repr__(self):
+        return f"SignalTable({len(self.symbols)} symbols x {self.names})"
+
+    # Columnar access -----------------------------------------------------------
+
+    def column(self, name: str, default: float = np.nan) -> np.ndarray:
+        """Values of one metric for every row (a view); `default`-filled if the metric is absent."""
+        j = self._cols.get(name)
+        if j is None:
+            return np.full(len(self.symbols), default, dtype=float)
+        return self._matrix[:, j]
+
+    def rows(self, symbols: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._rows[s] for s in symbols), dtype=np.intp)
+
+    def select(self, symbols: Iterable[str]) -> "SignalTable":
+        """Table restricted to `symbols` (in that order); unknown symbols raise KeyError."""
+        symbols = list(symbols)
+        return self._from_matrix(symbols, self.names, self._matrix[self.rows(symbols)])
+
+    def filter(self, mask: np.ndarray) -> "SignalTable":
+        """Rows where the boolean `mask` is True."""
+        mask = np.asarray(mask, dtype=bool)
+        symbols = [s for s, keep in zip(self.symbols, mask) if keep]
+        return self._from_matrix(symbols, self.names, self._matrix[mask])
+
+    def with_columns(self, columns: Dict[str, Iterable[float]]) -> "SignalTable":
+        """Copy with `columns` (aligned with the rows) added or replaced."""
+        merged = {name: self._matrix[:, j] for name, j in self._cols.items()}
+        merged.update(columns)
+        return SignalTable(self.symbols, merged)
+
+    def to_pandas(self) -> "pd.DataFrame":
+        """symbol x metric DataFrame sharing this table's memory."""
+        import pandas as pd  # deferred: keeps pandas off gpt_utils' import path
+
+        return pd.DataFrame(self._matrix, index=pd.Index(self.symbols, name="symbol"),
+                            columns=self.names, copy=False)
+
+    def to_dict(self) -> Dict[str, dict]:
+        """Plain {ticker: {metric: value}} for JSON; missing (NaN) values become None."""
+        values = np.where(np.isnan(self._matrix), None, self._matrix).tolist()
+        return {s: dict(zip(self.names, values[i])) for i, s in enumerate(self.symbols)}
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
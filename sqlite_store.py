@@ -0,0 +1,59 @@
+"""
+sqlite_store.py
+
+Shared plumbing of the SQLite-backed stores (price_store, report_store,
+scenario_grid, symbol_index, sentiment_index): schema setup when a file is
+opened, one connection per call, and a thread-safe registry of the shared
+instance per path.
+
+Key classes:
+- SQLiteStore: Base class; subclasses set SCHEMA and may override _migrate().
+- StoreRegistry: Shared instance per path, created once under a lock.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from typing import Callable, Dict
+
+
+class SQLiteStore:
+    """
+    A SQLite file with SCHEMA applied on open. Each call opens its own
+    connection, so one instance can be shared between threads (and several
+    processes can use the same file).
+    """
+
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(self.SCHEMA)
+            self._migrate(conn)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _migrate(self, conn):
+        """Brings files created by older versions up to SCHEMA (no-op by default)."""
+
+
+class StoreRegistry:
+    """Shared instance per key (a path), built by `factory(key, *args)` on first use."""
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._instances: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, *args):
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                instance = self._instances[key] = self._factory(key, *args)
+            return instance
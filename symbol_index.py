@@ -0,0 +1,177 @@
+"""
+symbol_index.py
+
+Persistent local index of symbol metadata (long name, short name, sector,
+market cap, exchange). It is filled in bulk from the screener quotes that
+industry_select already downloads, so name lookups before each LLM prompt are
+in-memory dictionary reads instead of per-ticker `yf.Ticker(t).info` calls.
+
+Symbols that are missing or stale can be refreshed on a background thread with
+one bulk yahooquery request; callers never wait on it.
+
+Key class:
+- SymbolIndex: get()/names() lookups, update_from_quotes() bulk fill, refresh_async().
+- get_symbol_index(): Returns the shared index for the configured path.
+"""
+
+import os
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List
+
+import replay
+from circuit_breaker import get_breaker
+from sqlite_store import SQLiteStore, StoreRegistry
+
+DEFAULT_DB_PATH = os.getenv("SYMBOL_INDEX_PATH", os.path.join(".cache", "symbols.sqlite"))
+
+# Entries older than this are re-fetched by refresh_async()
+SYMBOL_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+FIELDS = ("long_name", "short_name", "sector", "market_cap", "exchange")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS symbols (
+    symbol TEXT PRIMARY KEY,
+    long_name TEXT,
+    short_name TEXT,
+    sector TEXT,
+    market_cap REAL,
+    exchange TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _record_from_quote(quote: dict, sector: str = None) -> dict:
+    """Normalizes a Yahoo quote/price dict into an index record."""
+    return {
+        "long_name": quote.get("longName") or quote.get("displayName"),
+        "short_name": quote.get("shortName"),
+        "sector": quote.get("sector") or sector,
+        "market_cap": quote.get("marketCap") or quote.get("market_cap"),
+        "exchange": quote.get("fullExchangeName") or quote.get("exchangeName") or quote.get("exchange"),
+    }
+
+
+class SymbolIndex(SQLiteStore):
+    """
+    In-memory dict of symbol -> metadata, backed by a SQLite file.
+    Reads never touch the network or the disk after the initial load.
+    """
+
+    SCHEMA = _SCHEMA
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self._records: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        super().__init__(path)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(f"SELECT symbol, {', '.join(FIELDS)}, updated_at FROM symbols").fetchall()
+        for symbol, *values, updated_at in rows:
+            record = dict(zip(FIELDS, values))
+            record["updated_at"] = updated_at
+            self._records[symbol] = record
+
+    def get(self, symbol: str) -> dict:
+        """Metadata record for `symbol`, or None if it is not indexed."""
+        return self._records.get(symbol)
+
+    def names(self, symbols: Iterable[str]) -> Dict[str, str]:
+        """symbol -> best display name (long name, then short name, then the symbol)."""
+        names = {}
+        for s in symbols:
+            record = self._records.get(s) or {}
+            names[s] = record.get("long_name") or record.get("short_name") or s
+        return names
+
+    def missing_or_stale(self, symbols: Iterable[str], max_age: float = SYMBOL_MAX_AGE_SECONDS) -> List[str]:
+        now = time.time()
+        out = []
+        for s in symbols:
+            record = self._records.get(s)
+            if record is None or now - record["updated_at"] > max_age:
+                out.append(s)
+        return out
+
+    def update(self, records: Dict[str, dict]):
+        """Upserts symbol -> record (FIELDS keys) into memory and disk."""
+        if not records:
+            return
+        now = time.time()
+        rows = []
+        with self._lock:
+            for symbol, record in records.items():
+                previous = self._records.get(symbol) or {}
+                # Keep previously known values when a source leaves a field empty
+                merged = {f: record.get(f) if record.get(f) is not None else previous.get(f) for f in FIELDS}
+                merged["updated_at"] = now
+                self._records[symbol] = merged
+                rows.append((symbol, *(merged[f] for f in FIELDS), now))
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO symbols (symbol, {', '.join(FIELDS)}, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except Exception as e:
+            print(f"[symbol_index] Could not persist {len(rows)} symbols: {e}")
+
+    def update_from_quotes(self, quotes: List[dict], sector: str = None):
+        """Bulk fill from Yahoo screener quotes."""
+        records = {}
+        for q in quotes or []:
+            symbol = q.get("symbol")
+            if symbol:
+                records[symbol] = _record_from_quote(q, sector=sector)
+        self.update(records)
+
+    def refresh(self, symbols: List[str]):
+        """Fetches metadata for `symbols` in one bulk yahooquery request (blocking)."""
+        from yahooquery import Ticker
+
+        if not symbols:
+            return
+        data = replay.call("yahoo", {"price": sorted(symbols)},
+                           lambda: get_breaker("yahoo").call(lambda: Ticker(symbols).price))
+        records = {}
+        for s in symbols:
+            info = data.get(s) if isinstance(data, dict) else None
+            if isinstance(info, dict):
+                records[s] = _record_from_quote(info)
+        self.update(records)
+
+    def refresh_async(self, symbols: Iterable[str]):
+        """
+        Refreshes missing/stale symbols on a daemon thread and returns immediately.
+        Symbols already being refreshed are skipped.
+        """
+        with self._lock:
+            todo = [s for s in self.missing_or_stale(symbols) if s not in self._in_flight]
+            self._in_flight.update(todo)
+        if not todo:
+            return None
+
+        def run():
+            try:
+                self.refresh(todo)
+            except Exception as e:
+                print(f"[symbol_index] Background refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.difference_update(todo)
+
+        thread = threading.Thread(target=run, name="symbol-index-refresh", daemon=True)
+        thread.start()
+        return thread
+
+
+_indexes = StoreRegistry(SymbolIndex)
+
+
+def get_symbol_index(path: str = DEFAULT_DB_PATH) -> SymbolIndex:
+    """Shared SymbolIndex per path, loaded from disk on first use."""
+    return _indexes.get(path)
@@ -0,0 +1,102 @@
+"""
+ttl_cache.py
+
+Small thread-safe key/value cache with time-to-live expiry and size-bounded
+least-recently-used eviction. Entries can optionally be persisted to a JSON
+file so a restarted process starts warm.
+
+Key class:
+- TTLCache: get()/put() with TTL expiry, LRU eviction and hit/miss counters.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    LRU cache whose entries expire `ttl_seconds` after they were stored.
+    Values must be JSON-serializable when `path` is set.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_seconds: float = 3600, path: str = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path:
+                self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"[ttl_cache] Ignoring unreadable cache file {self.path}: {e}")
+            return
+        now = time.time()
+        # Stored oldest-first, so re-inserting keeps the LRU order
+        for key, stored_at, value in raw:
+            if now - stored_at <= self.ttl_seconds:
+                self._entries[key] = (stored_at, value)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        payload = [[key, stored_at, value] for key, (stored_at, value) in self._entries.items()]
+        try:
+            # Write to a temp file and rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"[ttl_cache] Could not persist cache to {self.path}: {e}")